@@ -0,0 +1,289 @@
+﻿"""
+Many independent matches in NumPy arrays, all stepped at once with the rules of GameState.step
+(for bot training and balance tuning), and a pool of processes stepping them in shared memory
+"""
+from multiprocessing import shared_memory
+import copy
+import multiprocessing
+import os
+import numpy as np
+from game import (AIR_FRICTION, BALL_DIAMETER, BALL_SPEED, FLOOR_HEIGHT, GRAVITY, GROUND_Y,
+                  HIT_DAMAGE, JUMP_SPEED, MAX_HEALTH, PLATFORM_HEIGHT, RECHARGE, RECOIL, RECOIL_LOSS, ROT_SPEED, SPEED,
+                  TIMESTEP, WHEEL_DIAMETER, WHEEL_SPACE, WIDTH, sweep_tank)
+
+TANK_FIELDS = ("x", "dx", "y", "dy", "r", "dr", "recoil", "drecoil", "health", "last_shot")
+BALL_FIELDS = ("ball_x", "ball_y", "ball_dx", "ball_dy")
+INPUT_FIELDS = ("move", "rotate", "jump", "shoot")
+FACING = (1, -1)  # of the red and the green Tank
+
+
+def layout(n: int, capacity: int) -> list[tuple[str, tuple[int, ...], type]]:
+    """
+    Get the arrays of a BatchState, in the order they are stored
+    :param n: the number of matches
+    :param capacity: the number of balls per match
+    :return: (name, shape, dtype) of every array
+    """
+    return ([("time", (n,), np.float64)] +
+            [(name, (n, 2), np.float64) for name in TANK_FIELDS] +
+            [(name, (n, capacity), np.float64) for name in BALL_FIELDS] +
+            [("ball_alive", (n, capacity), np.bool_)] +
+            [("move", (n, 2), np.int8), ("rotate", (n, 2), np.int8), ("jump", (n, 2), np.bool_),
+             ("shoot", (n, 2), np.bool_)])
+
+
+class BatchState:
+    """
+    N matches, like N GameStates: every field is an array with one row per match (and one column per Tank,
+    red then green, for the Tank fields). A ball is freed as soon as it reaches the floor, because it can't hit
+    anything afterwards (in GameState it keeps rolling), so the Tanks' health is the same as with GameState.step
+    """
+
+    def __init__(self, n: int, capacity: int = 32, buffer=None, reset: bool = True) -> None:
+        """
+        Initiate the BatchState
+        :param n: the number of matches
+        :param capacity: the number of balls per match (a shot is lost if they are all in the air)
+        :param buffer: the writable buffer the arrays are stored in (like a SharedMemory.buf, see BatchState.nbytes),
+        None to allocate one
+        :param reset: whether to start all the matches (False to use the state already in the buffer)
+        """
+        self.n: int = n
+        self.capacity: int = capacity
+        if buffer is None:
+            buffer = bytearray(self.nbytes(n, capacity))
+        offset = 0
+        for name, shape, dtype in layout(n, capacity):
+            array = np.ndarray(shape, dtype, buffer, offset)
+            setattr(self, name, array)
+            offset += -(-array.nbytes // 8) * 8  # Aligned to 8 bytes
+        if reset:
+            self.reset()
+
+    @staticmethod
+    def nbytes(n: int, capacity: int = 32) -> int:
+        """
+        Get the size of the buffer of a BatchState
+        :param n: the number of matches
+        :param capacity: the number of balls per match
+        :return: the size in bytes
+        """
+        return sum(-(-int(np.prod(shape)) * np.dtype(dtype).itemsize // 8) * 8
+                   for _, shape, dtype in layout(n, capacity))
+
+    def view(self, start: int, stop: int) -> "BatchState":
+        """
+        Get some of the matches, sharing their arrays with this BatchState
+        :param start: the first match
+        :param stop: the match after the last one
+        :return: the BatchState of the matches
+        """
+        view = copy.copy(self)
+        for name, _, _ in layout(self.n, self.capacity):
+            setattr(view, name, getattr(self, name)[start:stop])
+        view.n = len(view.time)
+        return view
+
+    def reset(self, rows: np.ndarray | slice | None = None) -> None:
+        """
+        Start some matches again, like a new GameState
+        :param rows: the matches (indexes or a boolean mask), None for all of them
+        :return: None
+        """
+        if rows is None:
+            rows = slice(None)
+        self.time[rows] = 0
+        for name in TANK_FIELDS + INPUT_FIELDS:
+            getattr(self, name)[rows] = 0
+        self.x[rows] = (150, WIDTH - 150)
+        self.y[rows] = GROUND_Y
+        self.r[rows] = 25
+        self.health[rows] = MAX_HEALTH
+        self.ball_alive[rows] = False
+
+    @property
+    def over(self) -> np.ndarray:
+        """
+        Whether a Tank has no health left, for every match
+        """
+        return (self.health <= 0).any(axis=1)
+
+    def observe(self) -> np.ndarray:
+        """
+        Get the Tanks of every match
+        :return: an array of shape (n, 2, len(TANK_FIELDS))
+        """
+        return np.stack([getattr(self, name) for name in TANK_FIELDS], axis=-1)
+
+    def step(self, tm: float = TIMESTEP) -> None:
+        """
+        Simulate all the matches once, with the inputs in BatchState.move, rotate, jump and shoot
+        (like the Inputs of GameState.step, jump and shoot are reset afterwards)
+        :param tm: the simulated time
+        :return: None
+        """
+        self.time += tm
+        self.dx[:] = self.move
+        self.dx *= SPEED
+        self.dr[:] = self.rotate
+        self.dr *= ROT_SPEED
+        self.dy[self.jump & (self.y >= GROUND_Y)] = -JUMP_SPEED
+        shoot = self.shoot & (self.time[:, None] - self.last_shot > RECHARGE)
+        if shoot.any():
+            self.fire(shoot)
+        self.jump[:] = False
+        self.shoot[:] = False
+        np.minimum(WIDTH - WHEEL_SPACE / 2 - WHEEL_DIAMETER / 2 - 5,
+                   np.maximum(0 + WHEEL_SPACE / 2 + WHEEL_DIAMETER / 2 + 5, self.x + self.dx * tm), out=self.x)
+        self.dy += GRAVITY * tm
+        np.minimum(GROUND_Y, np.maximum(0, self.y + self.dy * tm), out=self.y)
+        np.minimum(89, np.maximum(1, self.r + self.dr * tm), out=self.r)
+        self.drecoil -= self.drecoil * RECOIL_LOSS * tm
+        self.recoil += self.drecoil * tm
+        self.recoil -= self.recoil * RECOIL_LOSS * tm
+        rows, slots = np.nonzero(self.ball_alive)  # Only the live balls, there are usually few of them
+        if not rows.size:
+            return
+        x, y = self.ball_x[rows, slots], self.ball_y[rows, slots]
+        dx, dy = self.ball_dx[rows, slots], self.ball_dy[rows, slots]
+        rolling = y >= FLOOR_HEIGHT - BALL_DIAMETER / 2
+        x0, y0 = x.copy(), y.copy()
+        dy += GRAVITY * tm
+        dx -= dx * AIR_FRICTION * tm
+        dy -= dy * AIR_FRICTION * tm
+        x += dx * tm
+        y += dy * tm
+        p1_toi = sweep_tank(self.x[rows, 0], self.y[rows, 0], x0, y0, x - x0, y - y0)
+        p2_toi = sweep_tank(self.x[rows, 1], self.y[rows, 1], x0, y0, x - x0, y - y0)
+        p1_hits = ~rolling & (p1_toi <= p2_toi) & (p1_toi != np.inf)
+        p2_hits = ~rolling & (p2_toi < p1_toi)
+        self.health[:, 0] -= HIT_DAMAGE * np.bincount(rows[p1_hits], minlength=self.n)
+        self.health[:, 1] -= HIT_DAMAGE * np.bincount(rows[p2_hits], minlength=self.n)
+        self.ball_x[rows, slots], self.ball_y[rows, slots] = x, y
+        self.ball_dx[rows, slots], self.ball_dy[rows, slots] = dx, dy
+        gone = p1_hits | p2_hits | (y >= FLOOR_HEIGHT - BALL_DIAMETER / 2)
+        self.ball_alive[rows[gone], slots[gone]] = False
+
+    def fire(self, shoot: np.ndarray) -> None:
+        """
+        Fire a ball from some Tanks' cannons, like GameState.shoot
+        :param shoot: True for every Tank that shoots, of shape (n, 2)
+        :return: None
+        """
+        self.drecoil[shoot] = RECOIL
+        self.last_shot[shoot] = np.broadcast_to(self.time[:, None], shoot.shape)[shoot]
+        for player, facing in enumerate(FACING):
+            rows = np.flatnonzero(shoot[:, player])
+            if not rows.size:
+                continue
+            free = ~self.ball_alive[rows]
+            slots = free.argmax(axis=1)  # The first free slot
+            has_slot = free[np.arange(len(rows)), slots]
+            rows, slots = rows[has_slot], slots[has_slot]
+            angle = np.radians(-facing * self.r[rows, player])
+            cos, sin = np.cos(angle), np.sin(angle)
+            self.ball_x[rows, slots] = (self.x[rows, player] - facing * (WHEEL_SPACE / 2 + WHEEL_DIAMETER / 2) +
+                                        facing * (WHEEL_SPACE + WHEEL_DIAMETER) * cos)
+            self.ball_y[rows, slots] = self.y[rows, player] - PLATFORM_HEIGHT / 2 + facing * (
+                    WHEEL_SPACE + WHEEL_DIAMETER) * sin
+            self.ball_dx[rows, slots] = facing * BALL_SPEED * cos
+            self.ball_dy[rows, slots] = facing * BALL_SPEED * sin
+            self.ball_alive[rows, slots] = True
+
+
+def work(name: str, n: int, capacity: int, start: int, stop: int, conn) -> None:
+    """
+    Step some matches of a BatchPool every time the pool asks (runs in a worker process)
+    :param name: the name of the SharedMemory
+    :param n: the number of matches of the pool
+    :param capacity: the number of balls per match
+    :param start: the first match of this worker
+    :param stop: the match after the last one of this worker
+    :param conn: the end of the Pipe to the pool
+    :return: None
+    """
+    memory = shared_memory.SharedMemory(name=name)
+    state = BatchState(n, capacity, memory.buf, reset=False).view(start, stop)
+    try:
+        while True:
+            command = conn.recv()
+            if command is None:
+                break
+            tm, steps = command
+            try:
+                for _ in range(steps):
+                    state.step(tm)
+            except Exception as error:
+                conn.send(error)
+            else:
+                conn.send(None)
+    finally:
+        del state  # The arrays must be released before the memory is closed
+        memory.close()
+
+
+class BatchPool:
+    """
+    A BatchState in shared memory, stepped by worker processes: each one steps its own matches in place,
+    so nothing is copied between the processes
+    """
+
+    def __init__(self, n: int, workers: int | None = None, capacity: int = 32) -> None:
+        """
+        Initiate the BatchPool and start its workers
+        :param n: the number of matches
+        :param workers: the number of processes, None for one per CPU
+        :param capacity: the number of balls per match
+        """
+        workers = max(1, min(n, workers or os.cpu_count() or 1))
+        self.memory: shared_memory.SharedMemory = shared_memory.SharedMemory(create=True,
+                                                                            size=BatchState.nbytes(n, capacity))
+        self.state: BatchState = BatchState(n, capacity, self.memory.buf)
+        self.pipes: list = []
+        self.processes: list[multiprocessing.Process] = []
+        bounds = np.linspace(0, n, workers + 1).astype(int).tolist()
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=work, args=(self.memory.name, n, capacity, start, stop, child),
+                                              daemon=True)
+            process.start()
+            child.close()
+            self.pipes.append(parent)
+            self.processes.append(process)
+
+    def __enter__(self) -> "BatchPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def step(self, tm: float = TIMESTEP, steps: int = 1) -> None:
+        """
+        Simulate all the matches with the inputs in BatchPool.state (jump and shoot are only used by the first step,
+        BatchState.step resets them)
+        :param tm: the simulated time of a step
+        :param steps: the number of steps
+        :return: None
+        """
+        for pipe in self.pipes:
+            pipe.send((tm, steps))
+        errors = [pipe.recv() for pipe in self.pipes]
+        for error in errors:
+            if error is not None:
+                raise error
+
+    def close(self) -> None:
+        """
+        Stop the workers and free the shared memory (BatchPool.state can't be used afterwards)
+        :return: None
+        """
+        for pipe in self.pipes:
+            pipe.send(None)
+            pipe.close()
+        for process in self.processes:
+            process.join()
+        self.pipes.clear()
+        self.processes.clear()
+        self.state = None  # The arrays must be released before the memory is closed
+        self.memory.close()
+        self.memory.unlink()
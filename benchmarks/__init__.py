@@ -0,0 +1,26 @@
+﻿"""
+Headless benchmarks of the hot paths (physics, state serialisation, networking, batched matches).
+Run all of them from the repository root: python -m benchmarks [--quick] [--output results.json]
+"""
+import statistics
+import time
+
+
+def measure(name: str, func, number: int, repeat: int = 5, **params) -> dict:
+    """
+    Time a function
+    :param name: the benchmark name
+    :param func: the function to time (called without arguments)
+    :param number: how many calls are timed together
+    :param repeat: how many times the calls are timed (the result is the best and the median)
+    :param params: the benchmark parameters, saved in the result
+    :return: the result (times in microseconds per call)
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - start) / number * 1e6)
+    return {"name": name, **params, "number": number, "repeat": repeat,
+            "min_us": min(times), "median_us": statistics.median(times)}
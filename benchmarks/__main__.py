@@ -0,0 +1,46 @@
+﻿import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from benchmarks import bench_batch, bench_network, bench_physics, bench_state
+
+SUITES = {"physics": bench_physics, "state": bench_state, "network": bench_network, "batch": bench_batch}
+
+
+def git_commit() -> str | None:
+    """
+    Get the current commit, to compare results across commits
+    :return: the commit hash, None if it isn't available
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Run the benchmarks, print JSON results")
+    parser.add_argument("suites", nargs="*", help=f"the suites to run: {', '.join(SUITES)} (all by default)")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes, for a fast check")
+    parser.add_argument("--output", help="write the results to this file instead of printing them")
+    args = parser.parse_args()
+    for name in args.suites:
+        if name not in SUITES:
+            parser.error(f"unknown suite \"{name}\"")
+    results = {"commit": git_commit(), "python": platform.python_version(), "time": time.time(), "results": []}
+    for name in args.suites or SUITES:
+        print(f"Running {name}", file=sys.stderr)
+        for result in SUITES[name].run(args.quick):
+            results["results"].append({"suite": name, **result})
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
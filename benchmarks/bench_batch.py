@@ -0,0 +1,50 @@
+﻿"""
+BatchState.step with many matches, in this process and in a BatchPool
+"""
+from batch import BatchPool, BatchState
+from benchmarks import measure
+
+SIZES = (1, 100, 10000)
+QUICK_SIZES = (1, 100)
+
+
+def bench_step(n: int) -> dict:
+    """
+    Time one BatchState.step, with every Tank shooting when it can
+    :param n: the number of matches
+    :return: the result
+    """
+    state = BatchState(n)
+
+    def step() -> None:
+        state.shoot[:] = True
+        state.step()
+
+    step()
+    return measure("batch.step", step, max(1, 20000 // n), matches=n)
+
+
+def bench_pool(n: int) -> dict:
+    """
+    Time one BatchPool.step, with one worker per CPU
+    :param n: the number of matches
+    :return: the result
+    """
+    with BatchPool(n) as pool:
+
+        def step() -> None:
+            pool.state.shoot[:] = True
+            pool.step()
+
+        step()
+        return measure("batch.pool_step", step, max(1, 20000 // n), matches=n, workers=len(pool.processes))
+
+
+def run(quick: bool = False) -> list[dict]:
+    """
+    Run the batch benchmarks
+    :param quick: if True, skips the biggest sizes
+    :return: the results
+    """
+    sizes = QUICK_SIZES if quick else SIZES
+    return [bench_step(n) for n in sizes] + [bench_pool(sizes[-1])]
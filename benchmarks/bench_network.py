@@ -0,0 +1,57 @@
+﻿"""
+network.send / network.recv throughput over a loopback connection
+"""
+import socket
+import threading
+import time
+import network
+
+SIZES = (100, 10000, 1000000)
+
+
+def bench_throughput(size: int, into: bool, total: int) -> dict:
+    """
+    Send messages over a loopback TCP connection as fast as possible
+    :param size: the message size
+    :param into: whether to receive with network.recv_into instead of network.recv
+    :param total: about how many bytes to send
+    :return: the result
+    """
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+    sender = socket.create_connection(listener.getsockname())
+    receiver, _ = listener.accept()
+    listener.close()
+    count = max(10, total // size)
+    data = bytes(size)
+
+    def send_all() -> None:
+        for _ in range(count):
+            network.send(sender, data)
+
+    buffer = bytearray(network.RECV_BUFFER_SIZE)
+    thread = threading.Thread(target=send_all, daemon=True)
+    start = time.perf_counter()
+    thread.start()
+    for _ in range(count):
+        if into:
+            network.recv_into(receiver, buffer)
+        else:
+            network.recv(receiver)
+    duration = time.perf_counter() - start
+    thread.join()
+    sender.close()
+    receiver.close()
+    return {"name": "network.throughput", "size": size, "recv_into": into, "messages": count,
+            "messages_per_s": count / duration, "mb_per_s": count * size / duration / 1e6}
+
+
+def run(quick: bool = False) -> list[dict]:
+    """
+    Run the network benchmarks
+    :param quick: if True, sends less data
+    :return: the results
+    """
+    total = 20000000 if quick else 200000000
+    return [bench_throughput(size, into, total) for size in SIZES for into in (False, True)]
@@ -0,0 +1,109 @@
+﻿"""
+Physics.sim with many mixed Objects, and Object.collides for every shape pair
+"""
+import random
+import time
+from physics import Physics, Object
+from benchmarks import measure
+
+SIZES = (10, 100, 1000, 5000)
+QUICK_SIZES = (10, 100, 1000)
+
+
+def make_physics(count: int, vectorized: bool = False, seed: int = 0) -> Physics:
+    """
+    Make a headless Physics with a floor and mixed rects and circles
+    :param count: the number of moving Objects
+    :param vectorized: Physics.vectorized
+    :param seed: the random seed (the same seed gives the same Objects)
+    :return: the Physics
+    """
+    rand = random.Random(seed)
+    width = max(640, int(count ** 0.5 * 40))
+    phys = Physics(None, vectorized=vectorized, width=width, height=width)
+    Object(phys, "rect", width / 2, width - 10, width, 20, gravity_amp=0, movable=False, draw=False)
+    for i in range(count):
+        x, y = rand.uniform(20, width - 20), rand.uniform(20, width - 40)
+        if i % 2:
+            Object(phys, "rect", x, y, rand.uniform(8, 20), rand.uniform(8, 20), r=rand.uniform(0, 360), draw=False)
+        else:
+            Object(phys, "circle", x, y, rand.uniform(8, 20), draw=False)
+        phys.objs[-1].dx, phys.objs[-1].dy = rand.uniform(-50, 50), rand.uniform(-50, 50)
+    return phys
+
+
+def bench_sim(count: int, vectorized: bool) -> dict:
+    """
+    Time one fixed step of Physics.sim
+    :param count: the number of moving Objects
+    :param vectorized: Physics.vectorized
+    :return: the result
+    """
+    phys = make_physics(count, vectorized)
+
+    def sim() -> None:
+        phys.accumulator = 0
+        phys.last_time = time.perf_counter() - phys.timestep  # Exactly one step, however long the last one took
+        phys.sim()
+
+    number = max(1, 2000 // count)
+    return measure("physics.sim", sim, number, count=count, vectorized=vectorized)
+
+
+def bench_scenery(count: int) -> dict:
+    """
+    Time one fixed step of Physics.sim in a level of immovable Objects with a few projectiles
+    :param count: the number of immovable Objects
+    :return: the result
+    """
+    rand = random.Random(0)
+    width = max(640, int(count ** 0.5 * 40))
+    phys = Physics(None, width=width, height=width)
+    for _ in range(count):
+        Object(phys, "rect", rand.uniform(0, width), rand.uniform(0, width), rand.uniform(8, 20), rand.uniform(8, 20),
+               r=rand.uniform(0, 360), gravity_amp=0, movable=False, draw=False)
+    for _ in range(10):
+        ball = Object(phys, "circle", rand.uniform(0, width), rand.uniform(0, width), 8, draw=False)
+        ball.dx, ball.dy = rand.uniform(-300, 300), rand.uniform(-300, 300)
+
+    def sim() -> None:
+        phys.accumulator = 0
+        phys.last_time = time.perf_counter() - phys.timestep
+        phys.sim()
+
+    sim()  # The immovable Objects fall asleep after the first step
+    return measure("physics.sim_scenery", sim, max(1, 20000 // count), count=count)
+
+
+def bench_collides() -> list[dict]:
+    """
+    Time Object.collides for every shape pair, touching and apart
+    :return: the results
+    """
+    phys = Physics(None)
+    firsts = (Object(phys, "rect", 100, 100, 40, 20, r=30, draw=False),
+              Object(phys, "circle", 300, 100, 20, draw=False))
+    others = {"rect": Object(phys, "rect", 0, 0, 40, 20, r=60, draw=False),
+              "circle": Object(phys, "circle", 0, 0, 20, draw=False)}
+    results = []
+    for first in firsts:
+        for typ, other in others.items():
+            for offset in (10, 500):  # Touching, then apart
+                other.x, other.y = first.x + offset, first.y + offset / 2
+                results.append(measure("object.collides", lambda: first.collides(other), 20000,
+                                       pair=f"{first.typ}-{typ}", hit=first.collides(other)))
+    return results
+
+
+def run(quick: bool = False) -> list[dict]:
+    """
+    Run the physics benchmarks
+    :param quick: if True, skips the biggest sizes
+    :return: the results
+    """
+    results = []
+    for count in QUICK_SIZES if quick else SIZES:
+        for vectorized in (False, True):
+            results.append(bench_sim(count, vectorized))
+        results.append(bench_scenery(count))
+    return results + bench_collides()
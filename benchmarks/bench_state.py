@@ -0,0 +1,53 @@
+﻿"""
+Encoding and decoding the game states and events sent by main.py
+"""
+import json
+from game import GameState, Inputs, TIMESTEP
+import network
+from benchmarks import measure
+
+BALL_COUNTS = (0, 10, 100)
+
+
+def play(balls: int) -> GameState:
+    """
+    Play a GameState until it has some balls
+    :param balls: the number of balls
+    :return: the GameState
+    """
+    state = GameState()
+    inputs = Inputs()
+    while len(state.balls) < balls:
+        inputs.shoot = True
+        state.step(TIMESTEP, (inputs, None))
+        state.balls.y[:state.balls.count] = 0  # Keep them in the air
+    return state
+
+
+def run(quick: bool = False) -> list[dict]:
+    """
+    Run the serialisation benchmarks
+    :param quick: unused (they are all quick)
+    :return: the results
+    """
+    results = []
+    for count in BALL_COUNTS:
+        state = play(count)
+        p1 = state.p1
+        tank = (p1.x, p1.dx, p1.y, p1.dy, p1.r, p1.dr, p1.recoil, p1.drecoil, p1.health)
+        balls = list(state.balls)[:count]
+        data = network.encode_state(state.time, tank, balls, (0, 0, state.next_id))
+        events = network.encode_events(balls, [ball[5] for ball in balls])
+        json_data = json.dumps([state.time, tank, balls, True])  # What main.py sent before the binary codec
+        results += [
+            measure("state.encode", lambda: network.encode_state(state.time, tank, balls, (0, 0, state.next_id)), 5000,
+                    balls=count, size=len(data)),
+            measure("state.decode", lambda: network.decode_state(data), 5000, balls=count, size=len(data)),
+            measure("state.json_encode", lambda: json.dumps([state.time, tank, balls, True]), 5000,
+                    balls=count, size=len(json_data)),
+            measure("state.json_decode", lambda: json.loads(json_data), 5000, balls=count, size=len(json_data)),
+            measure("events.encode", lambda: network.encode_events(balls, [ball[5] for ball in balls]), 5000,
+                    balls=count, size=len(events)),
+            measure("events.decode", lambda: network.decode_events(events), 5000, balls=count, size=len(events)),
+        ]
+    return results
@@ -0,0 +1,115 @@
+﻿"""
+Loopback round trip latency of the TCP messages, before (two writes per message with Nagle's algorithm)
+and after (TCP_NODELAY and one coalesced write per tick).
+Run from the repository root: python -m benchmarks.latency
+"""
+import argparse
+import json
+import socket
+import struct
+import threading
+import time
+import network
+
+
+def legacy_send(sock: socket.socket, data: bytes) -> None:
+    """
+    The old network.send: the size and the data in two writes
+    :param sock: the socket
+    :param data: the message
+    :return: None
+    """
+    sock.send(struct.pack("<I", len(data)))
+    sock.send(data)
+
+
+def percentile(values: list[float], p: float) -> float:
+    """
+    Get a percentile of some values
+    :param values: the sorted values
+    :param p: the percentile (0 to 100)
+    :return: the percentile
+    """
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def echo(sock: socket.socket, messages: int, coalesce: bool) -> None:
+    """
+    Send back every tick's messages until the connection is closed
+    :param sock: the server socket
+    :param messages: the number of messages per tick
+    :param coalesce: whether to send them with one write
+    :return: None
+    """
+    try:
+        while True:
+            tick = [network.recv(sock) for _ in range(messages)]
+            if coalesce:
+                network.send_many(sock, tick)
+            else:
+                for data in tick:
+                    legacy_send(sock, data)
+    except ConnectionError:
+        pass
+
+
+def measure(nodelay: bool, coalesce: bool, rounds: int, messages: int, size: int) -> dict:
+    """
+    Measure the round trips of a loopback connection
+    :param nodelay: whether to set TCP_NODELAY on both ends
+    :param coalesce: whether to send every tick's messages with one write (like Network.queue and Network.flush)
+    :param rounds: the number of round trips
+    :param messages: the number of messages per tick
+    :param size: the size of every message
+    :return: the results (round trip times in ms)
+    """
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+    client = socket.create_connection(listener.getsockname())
+    server, _ = listener.accept()
+    listener.close()
+    for sock in (client, server):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, int(nodelay))
+    thread = threading.Thread(target=echo, args=(server, messages, coalesce), daemon=True)
+    thread.start()
+    tick = [bytes(size)] * messages
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        if coalesce:
+            network.send_many(client, tick)
+        else:
+            for data in tick:
+                legacy_send(client, data)
+        for _ in range(messages):
+            network.recv(client)
+        times.append((time.perf_counter() - start) * 1000)
+    client.close()
+    thread.join()
+    server.close()
+    times.sort()
+    return {"nodelay": nodelay, "coalesce": coalesce, "rounds": rounds, "messages": messages, "size": size,
+            "p50_ms": percentile(times, 50), "p99_ms": percentile(times, 99), "max_ms": times[-1]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure the loopback round trip latency of the TCP messages")
+    parser.add_argument("--rounds", type=int, default=200, help="round trips per case")
+    parser.add_argument("--messages", type=int, default=2, help="messages per tick")
+    parser.add_argument("--size", type=int, default=100, help="bytes per message")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+    results = [measure(nodelay, coalesce, args.rounds, args.messages, args.size)
+               for nodelay, coalesce in ((False, False), (True, False), (False, True), (True, True))]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'TCP_NODELAY':<12}{'coalesce':<10}{'p50 ms':>10}{'p99 ms':>10}")
+    for result in results:
+        print(f"{str(result['nodelay']):<12}{str(result['coalesce']):<10}"
+              f"{result['p50_ms']:>10.3f}{result['p99_ms']:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
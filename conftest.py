@@ -0,0 +1,3 @@
+﻿"""
+Makes pytest put the repository root on sys.path, so the tests can import the game modules
+"""
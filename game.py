@@ -0,0 +1,423 @@
+﻿"""
+The game rules, without Tk or matplotlib, so matches can be simulated headless and faster than real time
+"""
+from collections import deque
+import numpy as np
+import math
+
+FLOOR_HEIGHT = 540
+WHEEL_DIAMETER = 20
+WHEEL_SPACE = 50
+WHEEL_NAILS = 5
+NAIL_DIAMETER = 2
+NAIL_SPACE = 12
+PLATFORM_HEIGHT = 13
+SPEED = 100
+JUMP_SPEED = 200
+ROT_SPEED = 20
+RECHARGE = 0.5
+RECOIL = 150
+RECOIL_LOSS = 5
+BALL_SPEED = 300
+BALL_DIAMETER = 10
+FLOOR_FRICTION = 7
+AIR_FRICTION = 0.2
+GRAVITY = 300
+MAX_HEALTH = 100
+HIT_DAMAGE = 5
+TIMESTEP = 1 / 120
+MAX_FRAME_TIME = 0.25
+WIDTH = 640
+GROUND_Y = FLOOR_HEIGHT - WHEEL_DIAMETER - PLATFORM_HEIGHT / 2
+COLOURS = ("red", "green")  # the Tank colours, balls store their index
+
+
+def rotate_point(x: float, y: float, r: float) -> tuple[float, float]:
+    """
+    Rotate a point
+    :param x: relative x
+    :param y: relative y
+    :param r: rotation
+    :return: point coordinates (x, y)
+    """
+    return x * math.cos(r) - y * math.sin(r), x * math.sin(r) + y * math.cos(r)
+
+
+class Inputs:
+    """
+    What a player wants to do during the next GameState.step
+    """
+
+    def __init__(self) -> None:
+        """
+        Initiate the Inputs (nothing pressed)
+        """
+        self.move: int = 0  # -1 for left, 1 for right
+        self.rotate: int = 0  # -1 for down, 1 for up
+        self.jump: bool = False  # reset after the step that uses it
+        self.shoot: bool = False  # reset after the step that uses it
+
+
+class Tank:
+    """
+    A player's tank
+    """
+
+    def __init__(self, x: float, y: float, facing: int, colour: str) -> None:
+        """
+        Initiate the Tank
+        :param x: Tank x
+        :param y: Tank y (the platform center)
+        :param facing: 1 if the cannon points right, -1 if it points left
+        :param colour: the Tank colour, also used as the owner of its balls
+        """
+        self.x: float = x
+        self.dx: float = 0
+        self.y: float = y
+        self.dy: float = 0
+        self.r: float = 25
+        self.dr: float = 0
+        self.recoil: float = 0
+        self.drecoil: float = 0
+        self.health: float = MAX_HEALTH
+        self.last_shot: float = 0
+        self.facing: int = facing
+        self.colour: str = colour
+
+    def hit(self, x: float, y: float) -> bool:
+        """
+        Whether a ball at (x, y) hits the Tank
+        :param x: ball x
+        :param y: ball y
+        :return: True if the ball hits the Tank, False otherwise
+        """
+        return (self.x - WHEEL_SPACE / 2 - WHEEL_DIAMETER / 2 - 5 - BALL_DIAMETER / 2 <= x <=
+                self.x + WHEEL_SPACE / 2 + WHEEL_DIAMETER / 2 + 5 + BALL_DIAMETER / 2 and
+                self.y - PLATFORM_HEIGHT / 2 <= y <= self.y + PLATFORM_HEIGHT / 2 + WHEEL_DIAMETER)
+
+    def hits(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """
+        Tank.hit for many balls at once
+        :param x: the balls' x
+        :param y: the balls' y
+        :return: True for every ball that hits the Tank
+        """
+        return ((self.x - WHEEL_SPACE / 2 - WHEEL_DIAMETER / 2 - 5 - BALL_DIAMETER / 2 <= x) &
+                (x <= self.x + WHEEL_SPACE / 2 + WHEEL_DIAMETER / 2 + 5 + BALL_DIAMETER / 2) &
+                (self.y - PLATFORM_HEIGHT / 2 <= y) & (y <= self.y + PLATFORM_HEIGHT / 2 + WHEEL_DIAMETER))
+
+    def sweep(self, x: np.ndarray, y: np.ndarray, dx: np.ndarray, dy: np.ndarray) -> np.ndarray:
+        """
+        Find when moving balls first hit the Tank (continuous Tank.hits, so fast balls can't go through it)
+        :param x: the balls' start x
+        :param y: the balls' start y
+        :param dx: the balls' movement x
+        :param dy: the balls' movement y
+        :return: the time of impact of every ball (0 at the start, 1 at the end of the movement), inf if it misses
+        """
+        return sweep_tank(self.x, self.y, x, y, dx, dy)
+
+
+def sweep_tank(tank_x: float | np.ndarray, tank_y: float | np.ndarray, x: np.ndarray, y: np.ndarray,
+               dx: np.ndarray, dy: np.ndarray) -> np.ndarray:
+    """
+    Find when moving balls first hit a Tank at (tank_x, tank_y) (see Tank.sweep). The Tank position can also be
+    an array broadcast against the balls' arrays, for many Tanks at once
+    :param tank_x: Tank x
+    :param tank_y: Tank y
+    :param x: the balls' start x
+    :param y: the balls' start y
+    :param dx: the balls' movement x
+    :param dy: the balls' movement y
+    :return: the time of impact of every ball (0 at the start, 1 at the end of the movement), inf if it misses
+    """
+    half_width = WHEEL_SPACE / 2 + WHEEL_DIAMETER / 2 + 5 + BALL_DIAMETER / 2
+    enter = np.zeros(np.shape(x))
+    leave = np.ones(np.shape(x))
+    for start, move, low, high in ((x, dx, tank_x - half_width, tank_x + half_width),
+                                   (y, dy, tank_y - PLATFORM_HEIGHT / 2,
+                                    tank_y + PLATFORM_HEIGHT / 2 + WHEEL_DIAMETER)):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t0, t1 = (low - start) / move, (high - start) / move
+        still = move == 0
+        inside = (low <= start) & (start <= high)
+        enter = np.maximum(enter, np.where(still, np.where(inside, -np.inf, np.inf), np.minimum(t0, t1)))
+        leave = np.minimum(leave, np.where(still, np.where(inside, np.inf, -np.inf), np.maximum(t0, t1)))
+    return np.where(enter <= leave, enter, np.inf)
+
+
+class BallPool:
+    """
+    The balls, in preallocated parallel NumPy arrays: the live balls are the first BallPool.count slots,
+    a despawned ball is replaced by the last one, so adding and despawning are O(1) and every step is vectorized
+    """
+
+    def __init__(self, capacity: int = 64) -> None:
+        """
+        Initiate the BallPool
+        :param capacity: the starting number of slots (doubled when they are all used)
+        """
+        self.count: int = 0
+        self.x: np.ndarray = np.zeros(capacity)
+        self.y: np.ndarray = np.zeros(capacity)
+        self.dx: np.ndarray = np.zeros(capacity)
+        self.dy: np.ndarray = np.zeros(capacity)
+        self.colour: np.ndarray = np.zeros(capacity, np.int8)  # index in COLOURS
+        self.id: np.ndarray = np.zeros(capacity, np.int64)
+        self.slots: dict[tuple[int, int], int] = {}  # (colour, id) -> slot
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self):
+        """
+        Iterate over copies of the balls as [x, y, dx, dy, colour, id]
+        """
+        count = self.count
+        for x, y, dx, dy, colour, ball_id in zip(self.x[:count].tolist(), self.y[:count].tolist(),
+                                                 self.dx[:count].tolist(), self.dy[:count].tolist(),
+                                                 self.colour[:count].tolist(), self.id[:count].tolist()):
+            yield [x, y, dx, dy, COLOURS[colour], ball_id]
+
+    def ball(self, slot: int) -> list:
+        """
+        Get a copy of a ball
+        :param slot: the ball's slot
+        :return: [x, y, dx, dy, colour, id]
+        """
+        return [float(self.x[slot]), float(self.y[slot]), float(self.dx[slot]), float(self.dy[slot]),
+                COLOURS[self.colour[slot]], int(self.id[slot])]
+
+    def find(self, colour: str, ball_id: int) -> int | None:
+        """
+        Find a ball
+        :param colour: ball colour
+        :param ball_id: ball id
+        :return: the ball's slot, None if it doesn't exist
+        """
+        return self.slots.get((COLOURS.index(colour), ball_id))
+
+    def add(self, x: float, y: float, dx: float, dy: float, colour: str, ball_id: int) -> int:
+        """
+        Add a ball
+        :param x: ball x
+        :param y: ball y
+        :param dx: ball x velocity
+        :param dy: ball y velocity
+        :param colour: ball colour
+        :param ball_id: ball id
+        :return: the ball's slot
+        """
+        slot = self.count
+        if slot == len(self.x):
+            for name in ("x", "y", "dx", "dy", "colour", "id"):
+                old = getattr(self, name)
+                new = np.zeros(len(old) * 2, old.dtype)
+                new[:slot] = old
+                setattr(self, name, new)
+        self.x[slot], self.y[slot], self.dx[slot], self.dy[slot] = x, y, dx, dy
+        self.colour[slot] = COLOURS.index(colour)
+        self.id[slot] = ball_id
+        self.slots[(COLOURS.index(colour), ball_id)] = slot
+        self.count += 1
+        return slot
+
+    def remove(self, slot: int) -> None:
+        """
+        Remove a ball, by moving the last one in its slot
+        :param slot: the ball's slot
+        :return: None
+        """
+        last = self.count - 1
+        del self.slots[(int(self.colour[slot]), int(self.id[slot]))]
+        if slot != last:
+            for array in (self.x, self.y, self.dx, self.dy, self.colour, self.id):
+                array[slot] = array[last]
+            self.slots[(int(self.colour[slot]), int(self.id[slot]))] = slot
+        self.count = last
+
+    def remove_many(self, slots: np.ndarray) -> None:
+        """
+        Remove balls
+        :param slots: the balls' slots, in increasing order
+        :return: None
+        """
+        for slot in slots[::-1].tolist():  # From the end, so no slot to remove is moved before it is removed
+            self.remove(slot)
+
+
+class GameState:
+    """
+    The state of a match between two Tanks
+    """
+
+    def __init__(self, y: float = GROUND_Y, tracked: str | None = None) -> None:
+        """
+        Initiate the GameState
+        :param y: the Tanks' starting y (they fall to the floor if it is above it)
+        :param tracked: the colour of the balls whose spawns and despawns are recorded in GameState.spawned and
+        GameState.despawned (to send them), None to record nothing
+        """
+        self.p1: Tank = Tank(150, y, 1, "red")
+        self.p2: Tank = Tank(WIDTH - 150, y, -1, "green")
+        self.balls: BallPool = BallPool()
+        self.time: float = 0
+        self.next_id: int = 0
+        self.tracked: str | None = tracked
+        self.spawned: deque[list] = deque()  # deques, so another thread can popleft while the game appends
+        self.despawned: deque[int] = deque()
+        self.health_log: list[tuple[float, float, float]] = [(0, MAX_HEALTH, MAX_HEALTH)]  # (time, p1, p2)
+
+    @property
+    def over(self) -> bool:
+        """
+        Whether a Tank has no health left
+        """
+        return self.p1.health <= 0 or self.p2.health <= 0
+
+    def log_health(self) -> None:
+        """
+        Add the Tanks' health to GameState.health_log if it changed since the last entry
+        :return: None
+        """
+        health = self.p1.health, self.p2.health
+        if self.health_log[-1][1:] != health:
+            self.health_log.append((self.time, *health))
+
+    def shoot(self, tank: Tank) -> None:
+        """
+        Fire a ball from a Tank's cannon
+        :param tank: the Tank that shoots
+        :return: None
+        """
+        tank.drecoil = RECOIL
+        pnt = rotate_point(tank.facing * (WHEEL_SPACE + WHEEL_DIAMETER), 0, math.radians(-tank.facing * tank.r))
+        speed = rotate_point(tank.facing * BALL_SPEED, 0, math.radians(-tank.facing * tank.r))
+        self.add_ball(tank.x - tank.facing * (WHEEL_SPACE / 2 + WHEEL_DIAMETER / 2) + pnt[0],
+                      tank.y - PLATFORM_HEIGHT / 2 + pnt[1],
+                      speed[0], speed[1], tank.colour)
+        tank.last_shot = self.time
+
+    def add_ball(self, x: float, y: float, dx: float, dy: float, colour: str) -> int:
+        """
+        Spawn a new ball with the next id
+        :param x: ball x
+        :param y: ball y
+        :param dx: ball x velocity
+        :param dy: ball y velocity
+        :param colour: the colour of the Tank that shot it
+        :return: the ball's slot in GameState.balls
+        """
+        slot = self.balls.add(x, y, dx, dy, colour, self.next_id)
+        self.next_id += 1
+        if colour == self.tracked:
+            self.spawned.append([x, y, dx, dy, colour, self.next_id - 1])
+        return slot
+
+    def remove_ball(self, slot: int) -> None:
+        """
+        Despawn a ball
+        :param slot: the ball's slot in GameState.balls
+        :return: None
+        """
+        if COLOURS[self.balls.colour[slot]] == self.tracked:
+            self.despawned.append(int(self.balls.id[slot]))
+        self.balls.remove(slot)
+
+    def sync_ball(self, x: float, y: float, dx: float, dy: float, colour: str, ball_id: int) -> None:
+        """
+        Update a ball received from the network, or spawn it if it doesn't exist
+        :param x: ball x
+        :param y: ball y
+        :param dx: ball x velocity
+        :param dy: ball y velocity
+        :param colour: ball colour
+        :param ball_id: the ball id (given by the GameState that spawned it)
+        :return: None
+        """
+        balls = self.balls
+        slot = balls.find(colour, ball_id)
+        if slot is None:
+            balls.add(x, y, dx, dy, colour, ball_id)
+        else:
+            balls.x[slot], balls.y[slot], balls.dx[slot], balls.dy[slot] = x, y, dx, dy
+
+    def despawn_ball(self, colour: str, ball_id: int) -> None:
+        """
+        Despawn a ball received from the network (does nothing if it already despawned here)
+        :param colour: ball colour
+        :param ball_id: ball id
+        :return: None
+        """
+        slot = self.balls.find(colour, ball_id)
+        if slot is not None:
+            self.balls.remove(slot)
+
+    def keep_balls(self, colour: str, ball_ids: set[int]) -> None:
+        """
+        Despawn all balls of a colour except some (used with a full snapshot from the network)
+        :param colour: ball colour
+        :param ball_ids: the ids of the balls to keep
+        :return: None
+        """
+        balls = self.balls
+        count = balls.count
+        drop = ((balls.colour[:count] == COLOURS.index(colour)) &
+                ~np.isin(balls.id[:count], np.fromiter(ball_ids, np.int64, len(ball_ids))))
+        balls.remove_many(np.flatnonzero(drop))
+
+    def step(self, tm: float, inputs: tuple["Inputs | None", "Inputs | None"] = (None, None)) -> None:
+        """
+        Simulate the game once
+        :param tm: the simulated time
+        :param inputs: the Inputs of both players, None for a Tank that isn't controlled here (keeps its velocity)
+        :return: None
+        """
+        self.time += tm
+        for tank, inp in zip((self.p1, self.p2), inputs):
+            if inp is None:
+                continue
+            tank.dx = inp.move * SPEED
+            tank.dr = inp.rotate * ROT_SPEED
+            if inp.jump and tank.y >= GROUND_Y:
+                tank.dy = -JUMP_SPEED
+            if inp.shoot and self.time - tank.last_shot > RECHARGE:
+                self.shoot(tank)
+            inp.jump = inp.shoot = False
+        for tank in (self.p1, self.p2):
+            tank.x = min(WIDTH - WHEEL_SPACE / 2 - WHEEL_DIAMETER / 2 - 5,
+                         max(0 + WHEEL_SPACE / 2 + WHEEL_DIAMETER / 2 + 5, tank.x + tank.dx * tm))
+            tank.dy += GRAVITY * tm
+            tank.y = min(GROUND_Y, max(0, tank.y + tank.dy * tm))
+            tank.r = min(89, max(1, tank.r + tank.dr * tm))
+            tank.drecoil -= tank.drecoil * RECOIL_LOSS * tm
+            tank.recoil += tank.drecoil * tm
+            tank.recoil -= tank.recoil * RECOIL_LOSS * tm
+        balls = self.balls
+        count = balls.count
+        if count:
+            x, y, dx, dy = balls.x[:count], balls.y[:count], balls.dx[:count], balls.dy[:count]
+            rolling = y >= FLOOR_HEIGHT - BALL_DIAMETER / 2  # Balls on the floor don't hit the Tanks
+            x0, y0 = x.copy(), y.copy()
+            dy += GRAVITY * tm
+            dx -= dx * AIR_FRICTION * tm
+            dy -= dy * AIR_FRICTION * tm
+            x += dx * tm
+            y += dy * tm
+            # Swept along the whole movement (before the floor stops it), so fast balls can't go through a Tank
+            p1_toi = self.p1.sweep(x0, y0, x - x0, y - y0)
+            p2_toi = self.p2.sweep(x0, y0, x - x0, y - y0)
+            p1_hits = ~rolling & (p1_toi <= p2_toi) & (p1_toi != np.inf)
+            p2_hits = ~rolling & (p2_toi < p1_toi)
+            floor = y >= FLOOR_HEIGHT - BALL_DIAMETER / 2
+            if floor.any():
+                y[floor] = FLOOR_HEIGHT - BALL_DIAMETER / 2
+                dx[floor] -= dx[floor] * FLOOR_FRICTION * tm
+                dy[floor] = 0
+            hits = p1_hits | p2_hits
+            if hits.any():
+                self.p1.health -= HIT_DAMAGE * int(np.count_nonzero(p1_hits))
+                self.p2.health -= HIT_DAMAGE * int(np.count_nonzero(p2_hits))
+                for slot in np.flatnonzero(hits)[::-1].tolist():  # From the end, like BallPool.remove_many
+                    self.remove_ball(slot)
+        self.log_health()  # Also logs the changes from the network since the last step
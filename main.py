@@ -1,253 +1,204 @@
 ﻿from tkinter import *
 from tkinter.messagebox import showinfo
 from tkinter.simpledialog import askstring
-import matplotlib.pyplot as plt
+from game import GameState, Inputs, MAX_FRAME_TIME, TIMESTEP, WIDTH
+from view import GameView, plot_health
+from profiler import PROFILER, Overlay
+from collections import deque
+import copy
 import threading
 import network
-import math
+import replay
 import time
-import json
 
-FLOOR_HEIGHT = 540
-WHEEL_DIAMETER = 20
-WHEEL_SPACE = 50
-WHEEL_NAILS = 5
-NAIL_DIAMETER = 2
-NAIL_SPACE = 12
-PLATFORM_HEIGHT = 13
-SPEED = 100
-JUMP_SPEED = 200
-ROT_SPEED = 20
-RECHARGE = 0.5
-RECOIL = 150
-RECOIL_LOSS = 5
-BALL_SPEED = 300
-BALL_DIAMETER = 10
-FLOOR_FRICTION = 7
-AIR_FRICTION = 0.2
-GRAVITY = 300
-MAX_HEALTH = 100
-HIT_DAMAGE = 5
 SIMULATE_PING = 0
-
-
-def rotate_point(x: float, y: float, r: float) -> tuple[float, float]:
-    """
-    Rotate a point
-    :param x: relative x
-    :param y: relative y
-    :param r: rotation
-    :return: point coordinates (x, y)
-    """
-    return x * math.cos(r) - y * math.sin(r), x * math.sin(r) + y * math.cos(r)
-
-
-def get_rect_rot(x: float, y: float, width: float, height: float, r: float) -> list[tuple[float, float]]:
-    """
-    Get the points of a rotated rectangle
-    :param x:
-    :param y:
-    :param width:
-    :param height:
-    :param r:
-    :return:
-    """
-    rad = math.radians(-r)
-    p1 = rotate_point(-width / 2, -height / 2, rad)
-    p2 = rotate_point(width / 2, -height / 2, rad)
-    p3 = rotate_point(width / 2, height / 2, rad)
-    p4 = rotate_point(-width / 2, height / 2, rad)
-    return [(x + p1[0], y + p1[1]),
-            (x + p2[0], y + p2[1]),
-            (x + p3[0], y + p3[1]),
-            (x + p4[0], y + p4[1])]
+NET_TICK_RATE = 30  # states sent per second
+SNAPSHOT_INTERVAL = 30  # send all the balls every SNAPSHOT_INTERVAL states, to correct any drift
+INTERP_DELAY = 0.1  # the other player is shown this many seconds in the past, to smooth uneven packets
+RECORD = True  # save a replay of every match
 
 
 def onpress(e):
-    global p1_dx, p1_dy, p1_dr, p1_last_shot, p1_drecoil
     key = e.keysym.lower()
-    if key == "a":
-        p1_dx = -SPEED
-    if key == "d":
-        p1_dx = SPEED
-    if key == "s":
-        p1_dr = -ROT_SPEED
-    if key == "w":
-        p1_dr = ROT_SPEED
-    if key == "space" and p1_y >= FLOOR_HEIGHT - WHEEL_DIAMETER - PLATFORM_HEIGHT / 2:
-        p1_dy = -JUMP_SPEED
-    if key in ("q", "e", "r", "f",
-               "shift_r", "next", "return", "control_r") and time.time() - p1_last_shot > RECHARGE:
-        p1_drecoil = RECOIL
-        pnt = rotate_point(WHEEL_SPACE + WHEEL_DIAMETER, 0, math.radians(-p1_r))
-        speed = rotate_point(BALL_SPEED, 0, math.radians(-p1_r))
-        balls.append([p1_x - WHEEL_SPACE / 2 - WHEEL_DIAMETER / 2 + pnt[0],
-                      p1_y - PLATFORM_HEIGHT / 2 + pnt[1],
-                      speed[0], speed[1], "red"])
-        p1_last_shot = time.time()
-    if key == "left":
-        p1_dx = -SPEED
-    if key == "right":
-        p1_dx = SPEED
-    if key == "down":
-        p1_dr = -ROT_SPEED
-    if key == "up":
-        p1_dr = ROT_SPEED
+    if key in ("a", "left"):
+        inputs.move = -1
+    if key in ("d", "right"):
+        inputs.move = 1
+    if key in ("s", "down"):
+        inputs.rotate = -1
+    if key in ("w", "up"):
+        inputs.rotate = 1
+    if key == "space":
+        inputs.jump = True
+    if key in ("q", "e", "r", "f", "shift_r", "next", "return", "control_r"):
+        inputs.shoot = True
+    if key == "f3":
+        overlay.toggle()
 
 
 def onrelease(e):
-    global p1_dx, p1_dr
     key = e.keysym.lower()
-    if key in ("a", "d"):
-        p1_dx = 0
-    if key in ("s", "w"):
-        p1_dr = 0
-    if key in ("left", "right"):
-        p1_dx = 0
-    if key in ("down", "up"):
-        p1_dr = 0
+    if key in ("a", "d", "left", "right"):
+        inputs.move = 0
+    if key in ("s", "w", "down", "up"):
+        inputs.rotate = 0
 
 
 def update():
-    global last_time, p1_x, p1_y, p1_dy, p1_r, p1_recoil, p1_drecoil, p1_health, p2_x, p2_y, p2_dy, p2_r, p2_recoil, \
-        p2_drecoil, p2_health
-    p1_health_history.append(p1_health)
-    p2_health_history.append(p2_health)
-    if p1_health <= 0 or p2_health <= 0:
-        if p1_health <= 0 and p2_health <= 0:
+    global last_time, accumulator, next_snapshot
+    if state.over:
+        if state.p1.health <= 0 and state.p2.health <= 0:
             showinfo("The game ended", "The game ended.\nIt's a tie")
-        elif p1_health <= 0:
+        elif state.p1.health <= 0:
             showinfo("The game ended", "The game ended.\nYou lost")
         else:
             showinfo("The game ended", "The game ended.\nYou won")
         root.destroy()
-        plt.plot(p2_health_history, color="green")
-        plt.plot(p1_health_history, color="red")
-        plt.show()
+        recorder.close()
+        plot_health(state)
         exit(0)
-    tm = time.time() - last_time
-    p1_x = min(640 - WHEEL_SPACE / 2 - WHEEL_DIAMETER / 2 - 5,
-               max(0 + WHEEL_SPACE / 2 + WHEEL_DIAMETER / 2 + 5, p1_x + p1_dx * tm))
-    p1_dy += GRAVITY * tm
-    p1_y = min(FLOOR_HEIGHT - WHEEL_DIAMETER - PLATFORM_HEIGHT / 2,
-               max(0, p1_y + p1_dy * tm))
-    p1_r = min(89, max(1, p1_r + p1_dr * tm))
-    p1_drecoil -= p1_drecoil * RECOIL_LOSS * tm
-    p1_recoil += p1_drecoil * tm
-    p1_recoil -= p1_recoil * RECOIL_LOSS * tm
-    p2_x = min(640 - WHEEL_SPACE / 2 - WHEEL_DIAMETER / 2 - 5,
-               max(0 + WHEEL_SPACE / 2 + WHEEL_DIAMETER / 2 + 5, p2_x + p2_dx * tm))
-    p2_dy += GRAVITY * tm
-    p2_y = min(FLOOR_HEIGHT - WHEEL_DIAMETER - PLATFORM_HEIGHT / 2,
-               max(0, p2_y + p2_dy * tm))
-    p2_r = min(89, max(1, p2_r + p2_dr * tm))
-    p2_drecoil -= p2_drecoil * RECOIL_LOSS * tm
-    p2_recoil += p2_drecoil * tm
-    p2_recoil -= p2_recoil * RECOIL_LOSS * tm
-    for i in balls:
-        i[3] += GRAVITY * tm
-        i[2] -= i[2] * AIR_FRICTION * tm
-        i[3] -= i[3] * AIR_FRICTION * tm
-        i[0] += i[2] * tm
-        i[1] += i[3] * tm
-        if i[1] >= FLOOR_HEIGHT - BALL_DIAMETER / 2:
-            i[1] = FLOOR_HEIGHT - BALL_DIAMETER / 2
-            i[2] -= i[2] * FLOOR_FRICTION * tm
-            i[3] = 0
-        else:
-            if (p1_x - WHEEL_SPACE / 2 - WHEEL_DIAMETER / 2 - 5 - BALL_DIAMETER / 2 <= i[0] <=
-                    p1_x + WHEEL_SPACE / 2 + WHEEL_DIAMETER / 2 + 5 + BALL_DIAMETER / 2 and
-                    p1_y - PLATFORM_HEIGHT / 2 <= i[1] <= p1_y + PLATFORM_HEIGHT / 2 + WHEEL_DIAMETER):
-                p1_health -= HIT_DAMAGE
-                balls.remove(i)
-            if (p2_x - WHEEL_SPACE / 2 - WHEEL_DIAMETER / 2 - 5 - BALL_DIAMETER / 2 <= i[0] <=
-                    p2_x + WHEEL_SPACE / 2 + WHEEL_DIAMETER / 2 + 5 + BALL_DIAMETER / 2 and
-                    p2_y - PLATFORM_HEIGHT / 2 <= i[1] <= p2_y + PLATFORM_HEIGHT / 2 + WHEEL_DIAMETER):
-                p2_health -= HIT_DAMAGE
-                balls.remove(i)
-    last_time = time.time()
-    c.delete("all")
-    c.create_rectangle(0, FLOOR_HEIGHT, 645, 645, fill="gray")
-    for i in balls:
-        c.create_oval(i[0] - BALL_DIAMETER / 2, i[1] - BALL_DIAMETER / 2,
-                      i[0] + BALL_DIAMETER / 2, i[1] + BALL_DIAMETER / 2, fill=i[4])
-    c.create_oval(p1_x - WHEEL_SPACE / 2 - WHEEL_DIAMETER / 2, p1_y + PLATFORM_HEIGHT / 2,
-                  p1_x - WHEEL_SPACE / 2 + WHEEL_DIAMETER / 2, p1_y + PLATFORM_HEIGHT / 2 + WHEEL_DIAMETER, fill="red")
-    c.create_oval(p1_x + WHEEL_SPACE / 2 - WHEEL_DIAMETER / 2, p1_y + PLATFORM_HEIGHT / 2,
-                  p1_x + WHEEL_SPACE / 2 + WHEEL_DIAMETER / 2, p1_y + PLATFORM_HEIGHT / 2 + WHEEL_DIAMETER, fill="red")
-    for i in range(WHEEL_NAILS):
-        x, y = rotate_point(NAIL_SPACE / 2, 0,
-                            math.radians(p1_x / (WHEEL_DIAMETER * math.pi) * 360 + 360 / WHEEL_NAILS * i))
-        c.create_oval(p1_x - WHEEL_SPACE / 2 + x - NAIL_DIAMETER / 2,
-                      p1_y + PLATFORM_HEIGHT / 2 + WHEEL_DIAMETER / 2 + y - NAIL_DIAMETER / 2,
-                      p1_x - WHEEL_SPACE / 2 + x + NAIL_DIAMETER / 2,
-                      p1_y + PLATFORM_HEIGHT / 2 + WHEEL_DIAMETER / 2 + y + NAIL_DIAMETER / 2, fill="red")
-    for i in range(WHEEL_NAILS):
-        x, y = rotate_point(NAIL_SPACE / 2, 0,
-                            math.radians(p1_x / (WHEEL_DIAMETER * math.pi) * 360 + 360 / WHEEL_NAILS * i))
-        c.create_oval(p1_x + WHEEL_SPACE / 2 + x - NAIL_DIAMETER / 2,
-                      p1_y + PLATFORM_HEIGHT / 2 + WHEEL_DIAMETER / 2 + y - NAIL_DIAMETER / 2,
-                      p1_x + WHEEL_SPACE / 2 + x + NAIL_DIAMETER / 2,
-                      p1_y + PLATFORM_HEIGHT / 2 + WHEEL_DIAMETER / 2 + y + NAIL_DIAMETER / 2, fill="red")
-    pnt = rotate_point((WHEEL_SPACE + WHEEL_DIAMETER + 10) / 2 - p1_recoil, 0, math.radians(-p1_r))
-    c.create_polygon(get_rect_rot(p1_x - WHEEL_SPACE / 2 - WHEEL_DIAMETER / 2 + pnt[0],
-                                  p1_y + pnt[1],
-                                  WHEEL_SPACE + WHEEL_DIAMETER + 5,
-                                  PLATFORM_HEIGHT, p1_r), fill="red", outline="black")
-    c.create_rectangle(p1_x - WHEEL_SPACE / 2 - WHEEL_DIAMETER / 2 - 5, p1_y - PLATFORM_HEIGHT / 2,
-                       p1_x + WHEEL_SPACE / 2 + WHEEL_DIAMETER / 2 + 5, p1_y + PLATFORM_HEIGHT / 2, fill="red")
-    c.create_oval(p2_x - WHEEL_SPACE / 2 - WHEEL_DIAMETER / 2, p2_y + PLATFORM_HEIGHT / 2,
-                  p2_x - WHEEL_SPACE / 2 + WHEEL_DIAMETER / 2, p2_y + PLATFORM_HEIGHT / 2 + WHEEL_DIAMETER,
-                  fill="green")
-    c.create_oval(p2_x + WHEEL_SPACE / 2 - WHEEL_DIAMETER / 2, p2_y + PLATFORM_HEIGHT / 2,
-                  p2_x + WHEEL_SPACE / 2 + WHEEL_DIAMETER / 2, p2_y + PLATFORM_HEIGHT / 2 + WHEEL_DIAMETER,
-                  fill="green")
-    for i in range(WHEEL_NAILS):
-        x, y = rotate_point(NAIL_SPACE / 2, 0,
-                            math.radians(p2_x / (WHEEL_DIAMETER * math.pi) * 360 + 360 / WHEEL_NAILS * i))
-        c.create_oval(p2_x - WHEEL_SPACE / 2 + x - NAIL_DIAMETER / 2,
-                      p2_y + PLATFORM_HEIGHT / 2 + WHEEL_DIAMETER / 2 + y - NAIL_DIAMETER / 2,
-                      p2_x - WHEEL_SPACE / 2 + x + NAIL_DIAMETER / 2,
-                      p2_y + PLATFORM_HEIGHT / 2 + WHEEL_DIAMETER / 2 + y + NAIL_DIAMETER / 2, fill="green")
-    for i in range(WHEEL_NAILS):
-        x, y = rotate_point(NAIL_SPACE / 2, 0,
-                            math.radians(p2_x / (WHEEL_DIAMETER * math.pi) * 360 + 360 / WHEEL_NAILS * i))
-        c.create_oval(p2_x + WHEEL_SPACE / 2 + x - NAIL_DIAMETER / 2,
-                      p2_y + PLATFORM_HEIGHT / 2 + WHEEL_DIAMETER / 2 + y - NAIL_DIAMETER / 2,
-                      p2_x + WHEEL_SPACE / 2 + x + NAIL_DIAMETER / 2,
-                      p2_y + PLATFORM_HEIGHT / 2 + WHEEL_DIAMETER / 2 + y + NAIL_DIAMETER / 2, fill="green")
-    pnt = rotate_point(-(WHEEL_SPACE + WHEEL_DIAMETER + 10) / 2 + p2_recoil, 0, math.radians(p2_r))
-    c.create_polygon(get_rect_rot(p2_x + WHEEL_SPACE / 2 + WHEEL_DIAMETER / 2 + pnt[0],
-                                  p2_y + pnt[1],
-                                  WHEEL_SPACE + WHEEL_DIAMETER + 5,
-                                  PLATFORM_HEIGHT, 180 - p2_r), fill="green", outline="black")
-    c.create_rectangle(p2_x - WHEEL_SPACE / 2 - WHEEL_DIAMETER / 2 - 5, p2_y - PLATFORM_HEIGHT / 2,
-                       p2_x + WHEEL_SPACE / 2 + WHEEL_DIAMETER / 2 + 5, p2_y + PLATFORM_HEIGHT / 2, fill="green")
-    c.create_rectangle(10, 10, MAX_HEALTH + 10, 20)
-    c.create_rectangle(10, 10, p1_health + 10, 20, fill="red")
-    c.create_rectangle(630 - MAX_HEALTH, 10, 630, 20)
-    c.create_rectangle(530, 10, 530 + p2_health, 20, fill="green")
+    PROFILER.frame()
+    now = time.perf_counter()
+    accumulator += min(now - last_time, MAX_FRAME_TIME)
+    last_time = now
+    with PROFILER.time("sim"):
+        while received:  # Applied here rather than in the network threads, so the replay has them in order
+            apply, data, received_time = received.popleft()
+            try:
+                apply(data, received_time)
+            except ValueError:  # A wrong version or a truncated message, like any stray datagram on the port
+                PROFILER.count("dropped")
+        while accumulator >= TIMESTEP:
+            recorder.tick((inputs, None))
+            state.step(TIMESTEP, (inputs, None))
+            accumulator -= TIMESTEP
+        queue_events()
+        if now >= next_snapshot:  # Built here, send_net can't read the balls while the steps move and remove them
+            snapshots.append(network.snapshot_parts([mirror_ball(i) for i in state.balls if i[4] == "red"],
+                                                    state.next_id, events_sent))
+            next_snapshot = now + SNAPSHOT_INTERVAL / NET_TICK_RATE
+    with PROFILER.time("draw"):
+        tank = p2_snapshots.sample(now)
+        p2 = None
+        if tank is not None:  # Only drawn, the simulation (hits and health) uses the newest state
+            p2 = copy.copy(state.p2)
+            replay.set_tank(p2, tank)
+        view.draw(state, p2)
+    overlay.draw()
     root.after(1, update)
 
 
-def update_net():
-    global p2_x, p2_dx, p2_y, p2_dy, p2_r, p2_dr, p2_recoil, p2_drecoil, p2_health, balls
+def mirror_ball(ball: list) -> list:
+    """
+    Convert a local ball to how the other player sees it
+    :param ball: [x, y, dx, dy, colour, id]
+    :return: the mirrored ball
+    """
+    return [WIDTH - ball[0], ball[1], -ball[2], ball[3], "green", ball[5]]
+
+
+def queue_events() -> None:
+    """
+    Encode the red balls that spawned and despawned since the last call for send_net, numbered in order with the
+    snapshots (even with a snapshot, every spawn is sent over TCP, so a lost datagram can't lose a ball)
+    :return: None
+    """
+    global events_sent
+    if state.spawned or state.despawned:
+        events_sent += 1
+        outgoing_events.append(network.encode_events([mirror_ball(i) for i in state.spawned],
+                                                     list(state.despawned), events_sent))
+        state.spawned.clear()
+        state.despawned.clear()
+
+
+def send_net():
+    p1 = state.p1
+    ticker = network.Ticker(NET_TICK_RATE)
+    try:
+        while True:
+            while outgoing_events:
+                net.queue(outgoing_events.popleft())
+            net.flush()
+            parts = snapshots.popleft() if snapshots else [([], None)]
+            now = time.perf_counter()
+            echo = last_received[0] + now - last_received[1] if last_received else 0
+            tank = (WIDTH - p1.x, -p1.dx, p1.y, p1.dy, p1.r, p1.dr, p1.recoil, p1.drecoil, p1.health)
+            for balls, snapshot in parts:
+                try:
+                    net.send_state(network.encode_state(now, tank, balls, snapshot, echo))
+                except OSError:  # Like a lost datagram, the next state replaces it
+                    PROFILER.count("send errors")
+            ticker.wait()
+    except OSError:
+        state.p2.health = 0
+
+
+def apply_state(data: bytes, now: float) -> None:
+    """
+    Apply a state received from the other player
+    :param data: the encoded state
+    :param now: when it was received
+    :return: None
+    """
+    global last_received
+    tm, tank, balls, snapshot, echo = network.decode_state(data)
+    last_received = tm, now
+    if echo:
+        PROFILER.set("rtt", now - echo)
+    p2_snapshots.push(tm, tank, now)
+    recorder.set_tank(2, tank)
+    if snapshot is not None and not network.newer(events_applied, snapshot[0]):  # An older one would undo events
+        _, first_id, end_id = snapshot
+        recorder.keep_balls("green", {i[5] for i in balls} |
+                            {i[5] for i in state.balls if i[4] == "green" and not first_id <= i[5] < end_id})
+        for i in balls:
+            recorder.sync_ball(*i)
+
+
+def apply_events(data: bytes, now: float) -> None:
+    """
+    Apply ball events received from the other player
+    :param data: the encoded events
+    :param now: when they were received
+    :return: None
+    """
+    global events_applied
+    spawned, despawned, events_applied = network.decode_events(data)
+    for i in spawned:
+        recorder.sync_ball(*i)
+    for ball_id in despawned:
+        recorder.despawn_ball("green", ball_id)
+
+
+def receive(apply, data: bytes) -> None:
+    """
+    Queue a received message, for the next update
+    :param apply: the function that applies it
+    :param data: the message
+    :return: None
+    """
+    received.append((apply, data, time.perf_counter()))
+
+
+def recv_net(recv, apply):
     try:
         while True:
-            net.send_str(json.dumps(
-                [640 - p1_x, -p1_dx, p1_y, p1_dy, p1_r, p1_dr, p1_recoil, p1_drecoil, p1_health,
-                 [[640 - i[0], i[1], -i[2], i[3], "green"] for i in balls if i[4] == "red"]]))
-            p2_x, p2_dx, p2_y, p2_dy, p2_r, p2_dr, p2_recoil, p2_drecoil, p2_health, b = json.loads(net.recv_str())
-            balls = [i for i in balls if i[4] == "red"] + b
+            data = recv()
+            PROFILER.count("packets")
             if SIMULATE_PING > 0:
-                time.sleep(SIMULATE_PING)
-    except ConnectionResetError:
-        p2_health = 0
+                threading.Timer(SIMULATE_PING, receive, (apply, bytes(data))).start()
+            else:
+                receive(apply, bytes(data))  # recv reuses its buffer
+    except ConnectionError:
+        state.p2.health = 0
 
 
 def connect():
     global net
     net.connect()
+    net.join(room)
+    net.open_channel()
 
 
 def onclose():
@@ -276,8 +227,8 @@ except RuntimeError:
     room = askstring("Enter room code", "Enter room code\nLeave empty for public room")
     if room is None:
         exit(0)
-net = network.Network(1, broadcast_msg=f"SEARCH_FOR_CANNON_GAME_SERVER_{room}".encode("utf-8"),
-                      broadcast_reply=f"THIS_IS_CANNON_GAME_SERVER_{room}".encode("utf-8"), log=False)
+net = network.Network(1, broadcast_msg=network.ROOM_MSG + room.encode("utf-8"),
+                      broadcast_reply=network.ROOM_REPLY + room.encode("utf-8"), log=False)
 connect_thread = threading.Thread(target=connect, daemon=True)
 connect_thread.start()
 root.protocol("WM_DELETE_WINDOW", onclose)
@@ -292,36 +243,30 @@ lbl.destroy()
 root.title("Battle")
 c = Canvas(width=640, height=640, bg="white")
 c.pack()
+view = GameView(c)
+overlay = Overlay(c)
 
-p1_x = 150
-p1_dx = 0
-p1_y = 0
-p1_dy = 0
-p1_r = 25
-p1_dr = 0
-p1_recoil = 0
-p1_drecoil = 0
-p1_last_shot = time.time()
-p1_health = MAX_HEALTH
-p1_health_history = []
-p2_x = 490
-p2_dx = 0
-p2_y = 0
-p2_dy = 0
-p2_r = 25
-p2_dr = 0
-p2_recoil = 0
-p2_drecoil = 0
-p2_last_shot = time.time()
-p2_health = MAX_HEALTH
-p2_health_history = []
-balls = []
+state = GameState(0, "red")
+inputs = Inputs()
+p2_snapshots = network.SnapshotBuffer(INTERP_DELAY)
+last_received = None  # (tm, time) of the last state received, to echo it
+received = deque()  # (apply, data, time) of the received messages
+snapshots = deque(maxlen=1)  # the parts of the newest snapshot of the red balls, built by update for send_net
+outgoing_events = deque()  # encoded events, queued by update for send_net
+events_sent = 0
+events_applied = 0  # the number of the last events message received
+next_snapshot = 0
+recorder = replay.ReplayRecorder(replay.new_path() if RECORD else None, state)
 
-last_time = time.time()
-threading.Thread(target=update_net, daemon=True).start()
+last_time = time.perf_counter()
+accumulator = 0
+threading.Thread(target=send_net, daemon=True).start()
+threading.Thread(target=recv_net, args=(net.recv_into, apply_events), daemon=True).start()
+threading.Thread(target=recv_net, args=(net.recv_state_into, apply_state), daemon=True).start()
 update()
 
 root.bind("<KeyPress>", onpress)
 root.bind("<KeyRelease>", onrelease)
 
 root.mainloop()
+recorder.close()
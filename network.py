@@ -1,13 +1,31 @@
-﻿import socket
+﻿from typing import Awaitable, Callable
+from game import COLOURS
+import asyncio
+import socket
 import struct
 import threading
+import time
 
 PORT = 5000
 BROADCAST_PORT = 5001
 BROADCAST_MSG = b"SEARCH_FOR_SERVER"
 BROADCAST_REPLY = b"THIS_IS_SERVER"
+ROOM_MSG = b"SEARCH_FOR_CANNON_GAME_SERVER_"  # + room code
+ROOM_REPLY = b"THIS_IS_CANNON_GAME_SERVER_"  # + room code
 IS_SERVER = False
 LOG = True
+STATE_VERSION = 6
+FRAME_HEADER = struct.Struct("<I")  # message size
+RECV_BUFFER_SIZE = 65536
+# version, send time, echo, tank (x, dx, y, dy, r, dr, recoil, drecoil, health), ball count, snapshot,
+# snapshot events, snapshot first id, snapshot end id
+STATE_HEADER = struct.Struct("<Bdd9fH?III")
+EVENTS_HEADER = struct.Struct("<BIHH")  # version, events number, spawned ball count, despawned ball count
+SNAPSHOT_BALLS = 64  # the most balls per state, so a datagram fits in a 1500 byte MTU and is never fragmented
+STATE_BALL = struct.Struct("<I4fB")  # id, x, y, dx, dy, colour
+STATE_DESPAWN = struct.Struct("<I")  # id
+DATAGRAM_HEADER = struct.Struct("<I")  # sequence number
+CHANNEL_HELLO = struct.Struct("<H")  # UDP port
 
 
 def listen_for_broadcast(ips: list[str], max_players: int = -1, msg: bytes = BROADCAST_MSG, port: int = BROADCAST_PORT,
@@ -87,22 +105,67 @@ def get_sock(log: bool = LOG, timeout: float = 3, max_players: int = -1, msg: by
 
 
 def send(sock: socket.socket, data: bytes) -> None:
-    sock.send(struct.pack("<I", len(data)))
-    sock.send(data)
+    send_many(sock, (data,))
+
+
+def send_many(sock: socket.socket, messages: list[bytes] | tuple[bytes, ...]) -> None:
+    """
+    Send several messages with a single write (as if send was called for each one)
+    :param sock: the socket
+    :param messages: the messages
+    :return: None
+    """
+    buffers = []
+    for data in messages:
+        buffers.append(FRAME_HEADER.pack(len(data)))
+        buffers.append(data)
+    if not hasattr(socket.socket, "sendmsg"):  # Windows
+        sock.sendall(b"".join(buffers))
+        return
+    sent = sock.sendmsg(buffers)
+    if sent < sum(map(len, buffers)):  # Partial write, send the rest
+        sock.sendall(memoryview(b"".join(buffers))[sent:])
+
+
+def recv_exactly(sock: socket.socket, view: memoryview) -> None:
+    """
+    Fill a buffer from a socket (a single recv can return less than asked)
+    :param sock: the socket
+    :param view: the buffer to fill
+    :return: None
+    """
+    received = 0
+    while received < len(view):
+        size = sock.recv_into(view[received:])
+        if not size:
+            raise ConnectionResetError("Couldn't read data")
+        received += size
+
+
+def recv_into(sock: socket.socket, buffer: bytearray) -> memoryview:
+    """
+    Receive a message into a reusable buffer, without copying it.
+    The message is only valid until the buffer is used again
+    :param sock: the socket
+    :param buffer: the buffer (at least FRAME_HEADER.size long). A bigger message is received into a new buffer
+    :return: the message
+    """
+    view = memoryview(buffer)
+    recv_exactly(sock, view[:FRAME_HEADER.size])
+    size = FRAME_HEADER.unpack_from(buffer)[0]
+    if size > len(buffer):
+        view = memoryview(bytearray(size))
+    view = view[:size]
+    recv_exactly(sock, view)
+    return view
 
 
 def recv(sock: socket.socket) -> bytes:
-    size_bytes = sock.recv(4)
-    if len(size_bytes) != 4:
-        raise ConnectionResetError("Couldn't read size")
-    size = struct.unpack("<I", size_bytes)[0]
-    data = b""
-    while len(data) < size:
-        chunk = sock.recv(size - len(data))
-        if not chunk:
-            raise ConnectionResetError("Couldn't read data")
-        data += chunk
-    return data
+    header = bytearray(FRAME_HEADER.size)
+    recv_exactly(sock, memoryview(header))
+    data = bytearray(FRAME_HEADER.unpack(header)[0])
+    recv_exactly(sock, memoryview(data))
+    return bytes(data)
 
 
 def send_str(sock: socket.socket, string: str) -> None:
@@ -113,10 +176,319 @@ def recv_str(sock: socket.socket) -> str:
     return recv(sock).decode("utf-8")
 
 
+def encode_balls(data: bytearray, offset: int, balls: list[list]) -> int:
+    """
+    Encode balls into a buffer
+    :param data: the buffer
+    :param offset: where to start in the buffer
+    :param balls: [x, y, dx, dy, colour, id] for every ball, colour must be in COLOURS
+    :return: the offset after the balls
+    """
+    for x, y, dx, dy, colour, ball_id in balls:
+        STATE_BALL.pack_into(data, offset, ball_id, x, y, dx, dy, COLOURS.index(colour))
+        offset += STATE_BALL.size
+    return offset
+
+
+def decode_balls(data: memoryview) -> list[list]:
+    """
+    Decode balls encoded with encode_balls
+    :param data: exactly the encoded balls
+    :return: [x, y, dx, dy, colour, id] for every ball
+    """
+    return [[x, y, dx, dy, COLOURS[colour], ball_id]
+            for ball_id, x, y, dx, dy, colour in STATE_BALL.iter_unpack(data)]
+
+
+def unpack_header(header: struct.Struct, data: bytes) -> tuple:
+    """
+    Unpack the header of an encoded message
+    :param header: the Struct of the header
+    :param data: the encoded message
+    :return: the header values
+    """
+    if len(data) < header.size:
+        raise ValueError(f"State too short ({len(data)} bytes, expected {header.size})")
+    return header.unpack_from(data)
+
+
+def check_size(data: bytes, version: int, end: int) -> None:
+    """
+    Check the version and length of an encoded message
+    :param data: the encoded message
+    :param version: the version it was encoded with
+    :param end: the expected length
+    :return: None
+    """
+    if version != STATE_VERSION:
+        raise ValueError(f"Unsupported state version {version} (expected {STATE_VERSION})")
+    if len(data) < end:
+        raise ValueError(f"State too short ({len(data)} bytes, expected {end})")
+
+
+def encode_state(tm: float, tank: list[float] | tuple[float, ...], balls: list[list] = (),
+                 snapshot: tuple[int, int, int] | None = None, echo: float = 0) -> bytes:
+    """
+    Encode a tank to send it (much smaller and faster than JSON), with its balls if it is (a part of) a snapshot
+    :param tm: the sender's time (any clock, used to space the snapshots in a SnapshotBuffer)
+    :param tank: x, dx, y, dy, r, dr, recoil, drecoil, health
+    :param balls: [x, y, dx, dy, colour, id] for every ball, colour must be in COLOURS
+    :param snapshot: (events, first id, end id) if balls contains all the balls with first id <= id < end id
+    after the events-th events message (see snapshot_parts), so the others in that range should be despawned,
+    None if it isn't a snapshot
+    :param echo: the tm of the last received state, plus the time since it was received (the other end gets its
+    round trip time by subtracting it from its clock), 0 if no state was received
+    :return: the encoded state
+    """
+    data = bytearray(STATE_HEADER.size + STATE_BALL.size * len(balls))
+    STATE_HEADER.pack_into(data, 0, STATE_VERSION, tm, echo, *tank, len(balls), snapshot is not None,
+                           *(snapshot or (0, 0, 0)))
+    encode_balls(data, STATE_HEADER.size, balls)
+    return bytes(data)
+
+
+def decode_state(data: bytes) -> tuple[float, list[float], list[list], tuple[int, int, int] | None, float]:
+    """
+    Decode a state encoded with encode_state
+    :param data: the encoded state
+    :return: (tm, tank, balls, snapshot, echo) like the encode_state arguments
+    """
+    version, tm, echo, *tank, count, is_snapshot, events, first_id, end_id = unpack_header(STATE_HEADER, data)
+    end = STATE_HEADER.size + STATE_BALL.size * count
+    check_size(data, version, end)
+    snapshot = (events, first_id, end_id) if is_snapshot else None
+    return tm, tank, decode_balls(memoryview(data)[STATE_HEADER.size:end]), snapshot, echo
+
+
+def snapshot_parts(balls: list[list], end_id: int, events: int,
+                   size: int = SNAPSHOT_BALLS) -> list[tuple[list[list], tuple[int, int, int]]]:
+    """
+    Split a snapshot into parts of at most size balls, each covering a range of ids, so every part can be sent in
+    its own datagram and applied alone
+    :param balls: [x, y, dx, dy, colour, id] for every ball
+    :param end_id: the id of the next ball that will spawn (all the balls have smaller ids)
+    :param events: the number of events messages sent before the snapshot was taken
+    :param size: the most balls per part
+    :return: (balls, snapshot) of every part, like the encode_state arguments
+    """
+    balls = sorted(balls, key=lambda ball: ball[5])
+    chunks = [balls[start:start + size] for start in range(0, len(balls), size)] or [[]]
+    firsts = [0] + [chunk[0][5] for chunk in chunks[1:]]
+    return [(chunk, (events, first, end)) for chunk, first, end in zip(chunks, firsts, firsts[1:] + [end_id])]
+
+
+def encode_events(spawned: list[list], despawned: list[int], events: int = 0) -> bytes:
+    """
+    Encode the balls that spawned and despawned since the last events
+    :param spawned: [x, y, dx, dy, colour, id] for every new ball, colour must be in COLOURS
+    :param despawned: the ids of the balls that despawned
+    :param events: the number of this events message (1 for the first one), to order it with the snapshots
+    :return: the encoded events
+    """
+    data = bytearray(EVENTS_HEADER.size + STATE_BALL.size * len(spawned) + STATE_DESPAWN.size * len(despawned))
+    EVENTS_HEADER.pack_into(data, 0, STATE_VERSION, events, len(spawned), len(despawned))
+    offset = encode_balls(data, EVENTS_HEADER.size, spawned)
+    for ball_id in despawned:
+        STATE_DESPAWN.pack_into(data, offset, ball_id)
+        offset += STATE_DESPAWN.size
+    return bytes(data)
+
+
+def decode_events(data: bytes) -> tuple[list[list], list[int], int]:
+    """
+    Decode events encoded with encode_events
+    :param data: the encoded events
+    :return: (spawned, despawned, events) like the encode_events arguments
+    """
+    version, events, spawn_count, despawn_count = unpack_header(EVENTS_HEADER, data)
+    spawn_end = EVENTS_HEADER.size + STATE_BALL.size * spawn_count
+    end = spawn_end + STATE_DESPAWN.size * despawn_count
+    check_size(data, version, end)
+    view = memoryview(data)
+    despawned = [ball_id for ball_id, in STATE_DESPAWN.iter_unpack(view[spawn_end:end])]
+    return decode_balls(view[EVENTS_HEADER.size:spawn_end]), despawned, events
+
+
+def newer(seq: int, last: int) -> bool:
+    """
+    Whether a sequence number comes after another one (handles the wrap around after 2 ** 32)
+    :param seq: the new sequence number
+    :param last: the last sequence number
+    :return: True if seq is newer than last, False otherwise
+    """
+    return 0 < (seq - last) % 2 ** 32 < 2 ** 31
+
+
+class DatagramChannel:
+    """
+    An unreliable UDP channel for perishable data (like game states), where only the newest datagram matters:
+    every datagram has a sequence number, and datagrams older than the last received one are dropped.
+    Unlike TCP, a lost datagram doesn't delay the next ones
+    """
+
+    def __init__(self, port: int = 0, redundancy: int = 1) -> None:
+        """
+        Initiate the DatagramChannel
+        :param port: the UDP port to receive on, 0 for any free port
+        :param redundancy: how many times every datagram is sent (copies of a received datagram are dropped)
+        """
+        self.sock: socket.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("", port))
+        self.port: int = self.sock.getsockname()[1]
+        self.peer: tuple[str, int] | None = None
+        self.redundancy: int = redundancy
+        self.send_seq: int = 0
+        self.recv_seq: int | None = None
+        self.received: int = 0
+        self.lost: int = 0
+        self.dropped: int = 0
+        self.buffer: bytearray = bytearray(RECV_BUFFER_SIZE)
+
+    def send(self, data: bytes) -> None:
+        packet = DATAGRAM_HEADER.pack(self.send_seq) + data
+        self.send_seq = (self.send_seq + 1) % 2 ** 32
+        for _ in range(self.redundancy):
+            self.sock.sendto(packet, self.peer)
+
+    def recv(self) -> bytes:
+        """
+        Receive the next datagram that is newer than all the previous ones
+        :return: the datagram data
+        """
+        return bytes(self.recv_into())
+
+    def recv_into(self) -> memoryview:
+        """
+        Receive the next datagram that is newer than all the previous ones into DatagramChannel.buffer, without
+        copying it. It is only valid until the next recv_into
+        :return: the datagram data
+        """
+        view = memoryview(self.buffer)
+        while True:
+            size, addr = self.sock.recvfrom_into(self.buffer)
+            if addr != self.peer or size < DATAGRAM_HEADER.size:  # Only from the peer's own socket
+                continue
+            seq = DATAGRAM_HEADER.unpack_from(self.buffer)[0]
+            if self.recv_seq is not None and not newer(seq, self.recv_seq):
+                self.dropped += 1
+                continue
+            if self.recv_seq is not None:
+                self.lost += (seq - self.recv_seq) % 2 ** 32 - 1
+            self.recv_seq = seq
+            self.received += 1
+            return view[DATAGRAM_HEADER.size:size]
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+class Ticker:
+    """
+    Keeps a loop running at a fixed rate: Ticker.wait sleeps until the next tick
+    """
+
+    def __init__(self, rate: float) -> None:
+        """
+        Initiate the Ticker
+        :param rate: ticks per second
+        """
+        self.interval: float = 1 / rate
+        self.next_tick: float = time.perf_counter()
+
+    def wait(self) -> None:
+        """
+        Wait until the next tick. If the loop fell behind, the missed ticks are skipped instead of run in a burst.
+        It only sleeps (time.sleep can oversleep a little, but busy-waiting would hold the GIL from the other threads)
+        :return: None
+        """
+        self.next_tick += self.interval
+        now = time.perf_counter()
+        if self.next_tick <= now:
+            self.next_tick = now
+            return
+        time.sleep(self.next_tick - now)
+
+
+class SnapshotBuffer:
+    """
+    Smooths states received at uneven intervals: they are shown a fixed delay in the past, interpolated between the
+    two snapshots around that time, and extrapolated for a short time if the next snapshot is late.
+    Snapshots are kept in a fixed-size ring, and sampling is O(1) per frame
+    """
+
+    def __init__(self, delay: float = 0.1, size: int = 32, max_extrapolation: float = 0.25,
+                 offset_adapt: float = 0.01) -> None:
+        """
+        Initiate the SnapshotBuffer
+        :param delay: how far in the past the snapshots are shown (should cover a few send intervals)
+        :param size: how many snapshots are kept
+        :param max_extrapolation: how long to keep extrapolating past the newest snapshot before holding it
+        :param offset_adapt: how fast the clock offset estimate follows slower deliveries (0 to 1)
+        """
+        self.delay: float = delay
+        self.size: int = size
+        self.max_extrapolation: float = max_extrapolation
+        self.offset_adapt: float = offset_adapt
+        self.times: list[float] = [0.0] * size
+        self.values: list[tuple[float, ...] | None] = [None] * size
+        self.start: int = 0  # the oldest snapshot that might still be needed
+        self.count: int = 0
+        self.offset: float | None = None  # local time - sender time, for the fastest delivery seen
+
+    def push(self, tm: float, values: list[float] | tuple[float, ...], now: float | None = None) -> None:
+        """
+        Add a received snapshot (older ones than the newest are ignored)
+        :param tm: the sender's time of the snapshot
+        :param values: the snapshot values (all interpolated linearly)
+        :param now: the local time it was received, if None, uses time.perf_counter()
+        :return: None
+        """
+        if now is None:
+            now = time.perf_counter()
+        if self.count and tm <= self.times[(self.start + self.count - 1) % self.size]:
+            return
+        sample = now - tm
+        if self.offset is None or sample < self.offset:
+            self.offset = sample
+        else:
+            self.offset += (sample - self.offset) * self.offset_adapt
+        if self.count == self.size:
+            self.start = (self.start + 1) % self.size
+            self.count -= 1
+        idx = (self.start + self.count) % self.size
+        self.times[idx] = tm
+        self.values[idx] = tuple(values)
+        self.count += 1
+
+    def sample(self, now: float | None = None) -> tuple[float, ...] | None:
+        """
+        Get the values to show now
+        :param now: the local time, if None, uses time.perf_counter()
+        :return: the interpolated values, None if no snapshot was received yet
+        """
+        if not self.count:
+            return None
+        if now is None:
+            now = time.perf_counter()
+        target = now - self.offset - self.delay
+        size = self.size
+        while self.count > 2 and self.times[(self.start + 1) % size] <= target:
+            self.start = (self.start + 1) % size
+            self.count -= 1
+        old = self.start
+        new = (self.start + 1) % size
+        if self.count == 1 or target <= self.times[old]:
+            return self.values[old]
+        if self.times[new] < target:  # Late, extrapolate from the two newest snapshots
+            target = min(target, self.times[new] + self.max_extrapolation)
+        alpha = (target - self.times[old]) / (self.times[new] - self.times[old])
+        return tuple(a + (b - a) * alpha for a, b in zip(self.values[old], self.values[new]))
+
+
 class Network:
     def __init__(self, max_players: int = 1, port: int = PORT, broadcast_port: int = BROADCAST_PORT,
                  broadcast_msg: bytes = BROADCAST_MSG, broadcast_reply: bytes = BROADCAST_REPLY, log: bool = LOG,
-                 timeout: float = 3) -> None:
+                 timeout: float = 3, nodelay: bool = True) -> None:
         self.sock: socket.socket | None = None
         self.max_players = max_players
         self.port: int = port
@@ -126,23 +498,236 @@ class Network:
         self.log: bool = log
         self.timeout: float = timeout
         self.ips = []
+        self.channel: DatagramChannel | None = None
+        self.recv_buffer: bytearray = bytearray(RECV_BUFFER_SIZE)
+        self.nodelay: bool = nodelay  # Disable Nagle's algorithm, so small messages are sent right away
+        self.outbox: list[bytes] = []
 
     def connect(self) -> None:
         self.sock = get_sock(self.log, self.timeout, self.max_players, self.broadcast_msg, self.broadcast_port,
                              self.broadcast_reply, self.ips)
+        if self.nodelay:
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
 
     def send(self, data: bytes) -> None:
         send(self.sock, data)
 
+    def queue(self, data: bytes) -> None:
+        """
+        Queue a message, to send it with the others on the next Network.flush
+        :param data: the message
+        :return: None
+        """
+        self.outbox.append(data)
+
+    def flush(self) -> None:
+        """
+        Send all the queued messages with a single write (call it at the end of a tick)
+        :return: None
+        """
+        if self.outbox:
+            messages, self.outbox = self.outbox, []
+            send_many(self.sock, messages)
+
     def recv(self) -> bytes:
         return recv(self.sock)
 
+    def recv_into(self) -> memoryview:
+        return recv_into(self.sock, self.recv_buffer)
+
     def send_str(self, string: str) -> None:
         send_str(self.sock, string)
 
     def recv_str(self) -> str:
         return recv_str(self.sock)
 
+    def join(self, room: str) -> None:
+        """
+        Tell the other end which room this is, and wait for it to do the same
+        (a match server only answers once the room has both players)
+        :param room: the room code
+        :return: None
+        """
+        self.send_str(room)
+        other = self.recv_str()
+        if other != room:
+            raise ConnectionResetError(f"Joined room \"{other}\" instead of \"{room}\"")
+
+    def open_channel(self, redundancy: int = 1) -> None:
+        """
+        Open a DatagramChannel to the other end of the connection (it must call open_channel too).
+        The UDP ports are exchanged over the TCP connection, which stays used for reliable messages
+        :param redundancy: how many times every datagram is sent
+        :return: None
+        """
+        self.channel = DatagramChannel(redundancy=redundancy)
+        self.send(CHANNEL_HELLO.pack(self.channel.port))
+        port = CHANNEL_HELLO.unpack(self.recv())[0]
+        self.channel.peer = (self.sock.getpeername()[0], port)
+
+    def send_state(self, data: bytes) -> None:
+        self.channel.send(data)
+
+    def recv_state(self) -> bytes:
+        return self.channel.recv()
+
+    def recv_state_into(self) -> memoryview:
+        return self.channel.recv_into()
+
+
+async def async_send(writer: asyncio.StreamWriter, data: bytes) -> None:
+    writer.writelines((FRAME_HEADER.pack(len(data)), data))
+    await writer.drain()
+
+
+async def async_recv(reader: asyncio.StreamReader) -> bytes:
+    try:
+        size = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))[0]
+        return await reader.readexactly(size)
+    except asyncio.IncompleteReadError:
+        raise ConnectionResetError("Couldn't read data")
+
+
+class AsyncConnection:
+    """
+    One connection of an AsyncNetwork, with the same framing as send/recv (so it can talk to a Network)
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Initiate the AsyncConnection
+        :param reader: the connection's StreamReader
+        :param writer: the connection's StreamWriter
+        """
+        self.reader: asyncio.StreamReader = reader
+        self.writer: asyncio.StreamWriter = writer
+        self.addr: tuple[str, int] = writer.get_extra_info("peername")
+
+    async def send(self, data: bytes) -> None:
+        await async_send(self.writer, data)
+
+    async def recv(self) -> bytes:
+        return await async_recv(self.reader)
+
+    async def send_str(self, string: str) -> None:
+        await self.send(string.encode("utf-8"))
+
+    async def recv_str(self) -> str:
+        return (await self.recv()).decode("utf-8")
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class DiscoveryProtocol(asyncio.DatagramProtocol):
+    """
+    Answers broadcast searches (like listen_for_broadcast) inside an event loop
+    """
+
+    def __init__(self, reply: Callable[[bytes], bytes | None]) -> None:
+        """
+        Initiate the DiscoveryProtocol
+        :param reply: gets a received message, returns the reply to send, or None to ignore it
+        """
+        self.reply: Callable[[bytes], bytes | None] = reply
+        self.transport: asyncio.DatagramTransport | None = None
+
+    def connection_made(self, transport: asyncio.DatagramTransport) -> None:
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr: tuple[str, int]) -> None:
+        reply = self.reply(data)
+        if reply is not None:
+            self.transport.sendto(reply, addr)
+
+
+class AsyncNetwork:
+    """
+    An asyncio version of Network: one event loop serves many connections at once, without a thread per socket
+    """
+
+    def __init__(self, port: int = PORT, broadcast_port: int = BROADCAST_PORT, broadcast_msg: bytes = BROADCAST_MSG,
+                 broadcast_reply: bytes = BROADCAST_REPLY, log: bool = LOG) -> None:
+        self.port: int = port
+        self.broadcast_port: int = broadcast_port
+        self.broadcast_msg: bytes = broadcast_msg
+        self.broadcast_reply: bytes = broadcast_reply
+        self.log: bool = log
+        self.server: asyncio.Server | None = None
+        self.discovery: asyncio.DatagramTransport | None = None
+        self.connections: set[AsyncConnection] = set()
+
+    async def serve(self, handler: Callable[[AsyncConnection], Awaitable[None]]) -> None:
+        """
+        Start accepting connections (returns once the server is listening)
+        :param handler: called in a new task for every connection, which is closed when the handler returns
+        :return: None
+        """
+
+        async def on_connect(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            conn = AsyncConnection(reader, writer)
+            self.connections.add(conn)
+            if self.log:
+                print(f"[SERVER] Connected to {conn.addr[0]}:{conn.addr[1]}")
+            try:
+                await handler(conn)
+            except ConnectionError:
+                pass
+            finally:
+                self.connections.discard(conn)
+                conn.close()
+                if self.log:
+                    print(f"[SERVER] Disconnected from {conn.addr[0]}:{conn.addr[1]}")
+
+        if self.log:
+            print("[SERVER] Starting")
+        self.server = await asyncio.start_server(on_connect, "", self.port)
+
+    async def listen_for_broadcast(self, reply: Callable[[bytes], bytes | None] | None = None) -> None:
+        """
+        Answer broadcast searches, so that clients using Network.connect find this server
+        :param reply: gets a received message, returns the reply, or None to ignore it.
+        If None, answers AsyncNetwork.broadcast_msg with AsyncNetwork.broadcast_reply
+        :return: None
+        """
+        if reply is None:
+            def reply(data: bytes) -> bytes | None:
+                return self.broadcast_reply if data == self.broadcast_msg else None
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)  # Like listen_for_broadcast
+        sock.bind(("", self.broadcast_port))
+        loop = asyncio.get_running_loop()
+        self.discovery, _ = await loop.create_datagram_endpoint(lambda: DiscoveryProtocol(reply), sock=sock)
+
+    async def connect(self, server_ip: str) -> AsyncConnection:
+        """
+        Connect to a server
+        :param server_ip: the server address
+        :return: the connection
+        """
+        if self.log:
+            print(f"[CLIENT] Trying to connect to {server_ip}:{self.port}")
+        reader, writer = await asyncio.open_connection(server_ip, self.port)
+        if self.log:
+            print(f"[CLIENT] Connected to {server_ip}:{self.port}")
+        return AsyncConnection(reader, writer)
+
+    async def send_all(self, data: bytes) -> None:
+        """
+        Send a message to every connection
+        :param data: the message
+        :return: None
+        """
+        await asyncio.gather(*(conn.send(data) for conn in list(self.connections)), return_exceptions=True)
+
+    def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+        if self.discovery is not None:
+            self.discovery.close()
+        for conn in list(self.connections):
+            conn.close()
+
 
 def test_listen_for_updates(sock: socket.socket):
     try:
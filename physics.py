@@ -1,8 +1,13 @@
 ﻿"""
 Not used in main.py, but could be useful
 """
+from abc import ABC, abstractmethod
+from bisect import insort
 from tkinter import Canvas
 from typing import Literal
+from renderer import Renderer
+from profiler import PROFILER
+import numpy as np
 import math
 import time
 
@@ -12,19 +17,58 @@ class Physics:
     A parent for all Objects
     """
 
-    def __init__(self, canv: Canvas, gravity: float = 100, friction: float = 0.1) -> None:
+    def __init__(self, canv: Canvas | None, gravity: float = 100, friction: float = 0.1,
+                 broadphase: "Broadphase | None" = None, vectorized: bool = False, timestep: float = 1 / 120,
+                 max_frame_time: float = 0.25, interpolate: bool = False, width: int = 640,
+                 height: int = 640, ccd: bool = True, sleep_speed: float = 5, sleep_time: float = 0.5) -> None:
         """
         Initiates the Physics class
-        :param canv: a tkinter.Canvas to draw on
+        :param canv: a tkinter.Canvas to draw on, None to only simulate
         :param gravity: the default gravity for all objects to use
         :param friction: the default friction for all objects to use
+        :param broadphase: the Broadphase used to find possible collisions, if None, uses a SpatialHash
+        :param vectorized: if True, Object state is kept in NumPy arrays and integrated all at once
+        :param timestep: the fixed time of one Physics.step, used by Physics.sim
+        :param max_frame_time: the maximum real time Physics.sim catches up on (so a long freeze doesn't make it
+        run thousands of steps)
+        :param interpolate: if True, Objects are drawn between their last two steps (Physics.alpha),
+        which is smoother, but one step behind
+        :param width: the world width if there is no canvas
+        :param height: the world height if there is no canvas
+        :param ccd: if True, circles that move more than their radius in a step are swept against the other Objects,
+        so they can't go through them (continuous collision detection)
+        :param sleep_speed: the speed (in pixels or degrees per second) under which a movable Object is still
+        :param sleep_time: how long a movable Object has to stay still to fall asleep (it isn't simulated until
+        something touches it or its position or velocity is set), 0 to never put them to sleep.
+        Immovable Objects without velocity or gravity are always asleep (they are only queried for collisions)
         """
         self.canv = canv
         self.gravity = gravity
         self.friction = friction
-        self.width = int(self.canv.cget("width"))
-        self.height = int(self.canv.cget("height"))
+        self.broadphase: Broadphase = broadphase if broadphase is not None else SpatialHash()
+        if self.canv is None:
+            self.width = width
+            self.height = height
+            self.renderer: Renderer | None = None
+        else:
+            self.width = int(self.canv.cget("width"))
+            self.height = int(self.canv.cget("height"))
+            self.renderer: Renderer | None = Renderer(self.canv)
         self.objs: list[Object] = []
+        self.bodies: Bodies = Bodies(vectorized)
+        self.timestep: float = timestep
+        self.max_frame_time: float = max_frame_time
+        self.interpolate: bool = interpolate
+        self.ccd: bool = ccd
+        self.sleep_speed: float = sleep_speed
+        self.sleep_time: float = sleep_time
+        self.active: list[Object] = []  # The awake Objects, in the order they were added
+        self.slots: dict[int, Object] = {}  # Bodies slot -> Object
+        self.sleeping: AABBTree = AABBTree()
+        self.added: int = 0
+        self.accumulator: float = 0
+        self.alpha: float = 1
+        self.last_time: float = time.perf_counter()
 
     def add(self, obj) -> None:
         """
@@ -33,27 +77,230 @@ class Physics:
         :return:
         """
         self.objs.append(obj)
+        self.slots[obj.idx] = obj
+        obj.order = self.added
+        self.added += 1
+        self.active.append(obj)
+
+    def remove(self, obj) -> None:
+        """
+        Removes an Object, it can't be used afterwards (the Objects asleep around it wake up)
+        :param obj: the Object to remove
+        :return: None
+        """
+        self.objs.remove(obj)
+        if obj.awake:
+            self.active.remove(obj)
+        else:
+            self.sleeping.remove(obj)
+        for other in self.sleeping.query(*broadphase_aabb(obj)):
+            if other.movable:
+                self.wake(other)
+        del self.slots[obj.idx]
+        self.bodies.release(obj.idx)
+        if self.renderer is not None:
+            self.renderer.delete(obj)
+
+    def wake(self, obj) -> None:
+        """
+        Wake up a sleeping Object, so it is simulated again
+        :param obj: the Object
+        :return: None
+        """
+        if obj.awake:
+            return
+        self.sleeping.remove(obj)
+        obj.awake = True
+        obj.still_time = 0
+        self.bodies.active[obj.idx] = 1.0
+        insort(self.active, obj, key=lambda other: other.order)
+
+    def sleep(self, obj) -> None:
+        """
+        Put an Object to sleep: it stops, isn't simulated anymore and is only queried for collisions
+        :param obj: the Object
+        :return: None
+        """
+        if not obj.awake:
+            return
+        self.active.remove(obj)
+        self.fall_asleep(obj)
+
+    def fall_asleep(self, obj) -> None:
+        """
+        Stop an Object and put it in Physics.sleeping (it must already be out of Physics.active)
+        :param obj: the Object
+        :return: None
+        """
+        for field in (2, 3, 5):  # Not with the setters, they would wake it up
+            obj.fields[field][obj.idx] = 0.0
+        for src, dst in ((0, 9), (1, 10), (4, 11)):
+            obj.fields[dst][obj.idx] = obj.fields[src][obj.idx]
+        obj.awake = False
+        self.bodies.active[obj.idx] = 0.0
+        self.sleeping.insert(obj)
 
-    def draw(self, delete_all: bool = True) -> None:
+    def draw(self, delete_all: bool = False) -> None:
         """
-        Draw all Objects
+        Draw all Objects (their canvas items are reused between frames)
         :param delete_all: if True, deletes everything beforehand
         :return: None
         """
         if delete_all:
             self.canv.delete("all")
-        for obj in self.objs:
-            obj.draw()
+            self.renderer.items.clear()
+        alpha = self.alpha if self.interpolate else 1
+        with PROFILER.time("draw"):
+            for obj in self.objs:
+                obj.draw(alpha)
 
     def sim(self) -> None:
         """
-        Simulates the physics for all Objects
+        Simulates the physics for all Objects, in as many fixed steps as fit in the time since the last call
+        :return: None
+        """
+        now = time.perf_counter()
+        self.accumulator += min(now - self.last_time, self.max_frame_time)
+        self.last_time = now
+        with PROFILER.time("sim"):
+            while self.accumulator >= self.timestep:
+                self.step(self.timestep)
+                self.accumulator -= self.timestep
+        self.alpha = self.accumulator / self.timestep
+
+    def step(self, tm: float) -> None:
+        """
+        Simulates the physics for all Objects once (the same tm always gives the same result)
+        :param tm: the simulated time
+        :return: None
+        """
+        if self.bodies.vectorized:
+            self.bodies.save_previous()  # Copying all the slots is faster than picking the awake ones
+        else:
+            self.bodies.save_previous([obj.idx for obj in self.active])  # The sleeping Objects don't move
+        for first, second in self.pairs():
+            # The later Object bounces off the earlier one, unless only the earlier one can move
+            if second.movable:
+                obj, other = second, first
+            elif first.movable:
+                obj, other = first, second
+            else:
+                continue
+            if other not in obj.nocollide and obj not in other.nocollide and obj.collides(other):
+                if not obj.awake:
+                    self.wake(obj)
+                if not other.awake and other.movable:
+                    self.wake(other)
+                obj.bounce_off(other)
+        if self.bodies.vectorized:
+            self.bodies.integrate(self.gravity, tm)  # Bumps the generation of the Objects that moved
+        else:
+            for obj in self.active:
+                obj.integrate(tm)
+        if self.ccd:
+            self.sweep()
+        self.settle(tm)
+
+    def pairs(self) -> list[tuple["Object", "Object"]]:
+        """
+        Find the pairs of Objects that might collide: awake ones found by Physics.broadphase,
+        and awake ones with the sleeping ones around them
+        :return: (earlier Object, later Object) pairs, sorted by the later, then the earlier Object
+        """
+        active = self.active
+        found = [(active[i], active[j]) for i, j in self.broadphase.pairs(active)]
+        if self.sleeping:
+            for obj in active:
+                if not obj.hitbox:
+                    continue
+                for other in self.sleeping.query(*broadphase_aabb(obj)):
+                    if other.hitbox:
+                        found.append((other, obj) if other.order < obj.order else (obj, other))
+        found.sort(key=lambda pair: (pair[1].order, pair[0].order))
+        return found
+
+    def settle(self, tm: float) -> None:
+        """
+        Put the Objects that stayed still for Physics.sleep_time to sleep, and the immovable ones that don't move
+        :param tm: the simulated time
         :return: None
         """
-        for obj in self.objs:
-            obj.sim()
+        if self.bodies.vectorized:  # Only the Objects that fall asleep are touched
+            asleep = [self.slots[idx] for idx in self.bodies.settle(tm, self.sleep_speed, self.sleep_time)]
+            if asleep:
+                for obj in sorted(asleep, key=lambda obj: obj.order):
+                    self.fall_asleep(obj)
+                self.active = [obj for obj in self.active if obj.awake]
+            return
+        active = []
+        for obj in self.active:
+            dx, dy, dr = obj.dx, obj.dy, obj.dr
+            if obj.movable:
+                if self.sleep_time and math.hypot(dx, dy) < self.sleep_speed and abs(dr) < self.sleep_speed:
+                    obj.still_time += tm
+                    if obj.still_time >= self.sleep_time:
+                        self.fall_asleep(obj)
+                        continue
+                else:
+                    obj.still_time = 0
+            elif dx == dy == dr == 0 and obj.gravity_amp == 0:
+                self.fall_asleep(obj)
+                continue
+            active.append(obj)
+        self.active = active
 
-    def tick(self, delete_all: bool = True) -> None:
+    def sweep(self) -> None:
+        """
+        Stop the fast circles at their first collision during the last step, and bounce them off
+        (the discrete collisions of Physics.step would miss it)
+        :return: None
+        """
+        if self.bodies.vectorized:
+            fast = sorted((self.slots[idx] for idx in self.bodies.fast()), key=lambda obj: obj.order)
+            fast = [obj for obj in fast if obj.movable and obj.hitbox]
+        else:
+            fast = [obj for obj in self.active if obj.typ == "circle" and obj.movable and obj.hitbox and
+                    math.hypot(obj.x - obj.prev_x, obj.y - obj.prev_y) > obj.width / 2]  # Slower ones can't go through
+        if not fast:
+            return
+        # The awake Objects in a grid by the area they went through (the fast circles only move back inside it)
+        size = self.broadphase.cell_size if isinstance(self.broadphase, SpatialHash) else 64
+        cells: dict[tuple[int, int], list[Object]] = {}
+        boxes: dict[Object, tuple[float, float, float, float]] = {}
+        for other in self.active:
+            if not other.hitbox:
+                continue
+            ox0, oy0, ox1, oy1 = boxes[other] = swept_aabb(other)
+            for cx in range(int(ox0 // size), int(ox1 // size) + 1):
+                for cy in range(int(oy0 // size), int(oy1 // size) + 1):
+                    cells.setdefault((cx, cy), []).append(other)
+        for obj in fast:
+            x0, y0, x1, y1 = obj.get_aabb()
+            pad = obj.width * (math.sqrt(2) - 1) / 2  # Like SpatialHash
+            x0, y0 = min(x0, obj.prev_x - obj.width / 2) - pad, min(y0, obj.prev_y - obj.width / 2) - pad
+            x1, y1 = max(x1, obj.prev_x + obj.width / 2) + pad, max(y1, obj.prev_y + obj.width / 2) + pad
+            others = {other: None for cx in range(int(x0 // size), int(x1 // size) + 1)
+                      for cy in range(int(y0 // size), int(y1 // size) + 1) for other in cells.get((cx, cy), ())}
+            others = list(others) + self.sleeping.query(x0, y0, x1, y1)
+            others.sort(key=lambda other: other.order)
+            first, first_toi = None, None
+            for other in others:
+                if other is obj or not other.hitbox or other in obj.nocollide or obj in other.nocollide:
+                    continue
+                ox0, oy0, ox1, oy1 = boxes[other] if other in boxes else other.get_aabb()
+                if not (ox0 <= x1 and x0 <= ox1 and oy0 <= y1 and y0 <= oy1):
+                    continue
+                toi = obj.sweep(other)
+                if toi is not None and toi > 0 and (first_toi is None or toi < first_toi):
+                    first, first_toi = other, toi  # toi == 0 was already touching, Physics.step handles it
+            if first is not None:
+                # Stop just before the contact, so Physics.step doesn't bounce it back again
+                toi = max(0., first_toi - 0.01 / math.hypot(obj.x - obj.prev_x, obj.y - obj.prev_y))
+                obj.x = obj.prev_x + (obj.x - obj.prev_x) * toi
+                obj.y = obj.prev_y + (obj.y - obj.prev_y) * toi
+                obj.bounce_off(first)
+
+    def tick(self, delete_all: bool = False) -> None:
         """
         Simulates the physics for all Objects, then draws them
         :param delete_all: if True, deletes everything before drawing the Objects
@@ -63,11 +310,125 @@ class Physics:
         self.draw(delete_all)
 
 
+def _body_field(field: int, doc: str, geometry: bool = False, wake: bool = False) -> property:
+    """
+    Make an Object property stored in the Physics.bodies arrays
+    :param field: the index of the field in Bodies.FIELDS
+    :param doc: the property docstring
+    :param geometry: if True, setting it clears the cached geometry of the Object (see Object.get_geometry)
+    and wakes it up
+    :param wake: if True, setting it wakes the Object up (see Physics.wake)
+    :return: the property
+    """
+
+    def getter(self) -> float:
+        return self.fields[field][self.idx]
+
+    if geometry:
+        def setter(self, val: float) -> None:
+            self.fields[field][self.idx] = val
+            self.geometry = None
+            if not self.awake:
+                self.phys.wake(self)
+    elif wake:
+        def setter(self, val: float) -> None:
+            self.fields[field][self.idx] = val
+            if not self.awake:
+                self.phys.wake(self)
+    else:
+        def setter(self, val: float) -> None:
+            self.fields[field][self.idx] = val
+
+    return property(getter, setter, doc=doc)
+
+
+def _geometry_attr(name: str, doc: str, radius: bool = False) -> property:
+    """
+    Make an Object property that clears the cached geometry of the Object and wakes it up when set
+    :param name: the attribute the value is stored in
+    :param doc: the property docstring
+    :param radius: if True, setting it also sets the radius field (half of it for a circle, inf for a rect,
+    see Bodies.fast)
+    :return: the property
+    """
+
+    def getter(self) -> float:
+        return getattr(self, name)
+
+    def setter(self, val: float) -> None:
+        setattr(self, name, val)
+        if radius:
+            self.fields[14][self.idx] = val / 2 if self.typ == "circle" else math.inf
+        self.geometry = None
+        if not self.awake:
+            self.phys.wake(self)
+
+    return property(getter, setter, doc=doc)
+
+
+class Geometry:
+    """
+    The rotation, corners, bounding box and separating axes of an Object, computed once per position
+    """
+
+    __slots__ = ("cos", "sin", "points", "aabb", "axes", "generation")
+
+    def __init__(self, obj) -> None:
+        """
+        Compute the Geometry of an Object
+        :param obj: the Object
+        """
+        fields, idx = obj.fields, obj.idx
+        self.generation: float = fields[15][idx]  # It is outdated once the generation of the Object changes
+        x, y, r, width = float(fields[0][idx]), float(fields[1][idx]), float(fields[4][idx]), obj.width
+        if obj.typ == "rect":
+            rad = math.radians(r)
+            cos, sin = math.cos(rad), math.sin(rad)
+            half_width, half_height = width / 2, obj.height / 2
+            self.cos: float = cos
+            self.sin: float = sin
+            self.points: list[tuple[float, float]] = [  # Like rect_points, without computing the rotation 4 times
+                (x + (-half_width * cos - -half_height * sin), y + (-half_width * sin + -half_height * cos)),
+                (x + (half_width * cos - -half_height * sin), y + (half_width * sin + -half_height * cos)),
+                (x + (half_width * cos - half_height * sin), y + (half_width * sin + half_height * cos)),
+                (x + (-half_width * cos - half_height * sin), y + (-half_width * sin + half_height * cos))]
+            xs = [point[0] for point in self.points]
+            ys = [point[1] for point in self.points]
+            self.aabb: tuple[float, float, float, float] = min(xs), min(ys), max(xs), max(ys)
+            self.axes: tuple[tuple[float, float], ...] = (
+                (cos, sin), (math.cos(math.radians(r + 90)), math.sin(math.radians(r + 90))))
+        elif obj.typ == "circle":  # A circle's rotation doesn't change its shape
+            self.cos: float = 1
+            self.sin: float = 0
+            self.points: list[tuple[float, float]] = [(x, y)]
+            self.aabb: tuple[float, float, float, float] = x - width / 2, y - width / 2, x + width / 2, y + width / 2
+            self.axes: tuple[tuple[float, float], ...] = ()
+        else:
+            raise ValueError(f"\"{obj.typ}\" is not a valid object type (\"rect\" or \"circle\")")
+
+
 class Object:
     """
     A physics Object
     """
 
+    x = _body_field(0, "Object x", geometry=True)
+    y = _body_field(1, "Object y", geometry=True)
+    dx = _body_field(2, "Object x velocity", wake=True)
+    dy = _body_field(3, "Object y velocity", wake=True)
+    r = _body_field(4, "Object rotation", geometry=True)
+    dr = _body_field(5, "Object rotation velocity", wake=True)
+    mass = _body_field(6, "Object mass", wake=True)
+    friction = _body_field(7, "Object friction", wake=True)
+    gravity_amp = _body_field(8, "Gravity amplifier", wake=True)
+    prev_x = _body_field(9, "Object x before the last Physics.step")
+    prev_y = _body_field(10, "Object y before the last Physics.step")
+    prev_r = _body_field(11, "Object rotation before the last Physics.step")
+    still_time = _body_field(12, "How long the Object has been still (see Physics.sleep_time)")
+    movable = _body_field(13, "Whether collisions move the Object", wake=True)
+    width = _geometry_attr("_width", "Object width (diameter for a circle)", radius=True)
+    height = _geometry_attr("_height", "Object height")
+
     def __init__(self, phys: Physics, typ: Literal["rect", "circle"], x: float, y: float,
                  width: float, height: float = 0, r: float = 0, gravity_amp: float = 1, hitbox: bool = True,
                  nocollide: list | tuple = (), movable: bool = True, bounce: float = 1, friction: float = -1,
@@ -94,6 +455,15 @@ class Object:
         """
         self.phys: Physics = phys
         self.canv: Canvas = self.phys.canv
+        self.idx: int = self.phys.bodies.alloc()
+        self.fields: list = self.phys.bodies.fields
+        self.geometry: Geometry | None = None  # Cleared whenever x, y, r, width or height change
+        self.awake: bool = True  # False while in Physics.sleeping
+        self.still_time: float = 0
+        self.order: int = 0  # When it was added to Physics, set by Physics.add
+        if typ not in ("rect", "circle"):
+            raise ValueError(f"\"{typ}\" is not a valid object type (\"rect\" or \"circle\")")
+        self.typ: Literal["rect", "circle"] = typ
         self.x: float = x
         self.y: float = y
         self.width: float = width
@@ -112,9 +482,6 @@ class Object:
         self.dx: float = 0
         self.dy: float = 0
         self.dr: float = 0
-        if typ not in ("rect", "circle"):
-            raise ValueError(f"\"{typ}\" is not a valid object type (\"rect\" or \"circle\")")
-        self.typ: Literal["rect", "circle"] = typ
         if self.typ == "circle":
             self.height = self.width
         if self.mass == -1:
@@ -124,91 +491,124 @@ class Object:
                 self.mass = math.pi * (self.width / 2) * (self.width / 2)
         self.fill: str = fill
         self.outline: str = outline
-        self.last_time: float = time.time()
+        self.prev_x, self.prev_y, self.prev_r = self.x, self.y, self.r
         self.phys.add(self)
 
-    def draw(self) -> None:
+    def draw(self, alpha: float = 1) -> None:
         """
         Draw the Object (no physics)
+        :param alpha: how far between the previous and the current step to draw the Object (1 for the current one)
         :return: None
         """
+        if self.phys.renderer is None:  # Headless, nothing to draw or delete
+            return
         if not self.do_draw:
+            self.phys.renderer.delete(self)
             return
+        if alpha < 1 and self.awake:  # Sleeping Objects didn't move
+            x = self.prev_x + (self.x - self.prev_x) * alpha
+            y = self.prev_y + (self.y - self.prev_y) * alpha
+            r = self.prev_r + ((self.r - self.prev_r + 180) % 360 - 180) * alpha
+            points = None
+        else:
+            x, y, r = self.x, self.y, self.r
+            points = self.get_points()
         if self.typ == "rect":
-            self.canv.create_polygon(self.get_points(), fill=self.fill, outline=self.outline)
+            self.phys.renderer.polygon(self, points or rect_points(x, y, self.width, self.height, r), fill=self.fill,
+                                       outline=self.outline)
         elif self.typ == "circle":
-            self.canv.create_oval(self.x - self.width / 2, self.y - self.width / 2,
-                                  self.x + self.width / 2, self.y + self.width / 2,
-                                  fill=self.fill, outline=self.outline)
+            self.phys.renderer.oval(self, x - self.width / 2, y - self.width / 2,
+                                    x + self.width / 2, y + self.width / 2,
+                                    fill=self.fill, outline=self.outline)
         else:
             raise ValueError(f"\"{self.typ}\" is not a valid object type (\"rect\" or \"circle\")")
 
-    def sim(self) -> None:
+    def sim(self, tm: float | None = None) -> None:
         """
-        Simulate the Object's physics
+        Simulate the Object's physics (use Physics.sim() if you want to simulate all Objects)
+        :param tm: the simulated time, if None, uses Physics.timestep
         :return: None
         """
         if self.hitbox and self.movable:
-            for idx, obj in enumerate(self.phys.objs):
+            objs = self.phys.objs
+            self_idx = objs.index(self)
+            for idx, obj in enumerate(objs):
                 if (obj.hitbox and obj is not self and obj not in self.nocollide and self not in obj.nocollide
-                        and self.collides(obj) and (not obj.movable or idx < self.phys.objs.index(self))):
-                    if self.typ == "rect":
-                        if obj.typ == "rect":
-                            pass
-                        elif obj.typ == "circle":
-                            point = rotate_point(obj.x - self.x, obj.y - self.y, math.radians(-self.r))
-                            if abs(point[0]) > self.width / 2 - obj.width / 4:
-                                ax = math.radians(self.r)
-                            else:
-                                ax = math.radians(self.r) + math.pi / 2
-                            ax += ax - math.atan2(obj.dy, obj.dx) + math.pi
-                            self.dx = math.cos(ax) * math.hypot(self.dx, self.dy) * self.bounce * obj.bounce
-                            self.dy = math.sin(ax) * math.hypot(self.dx, self.dy)
-                            if obj.movable:
-                                obj.dx += -self.dx / 2
-                                obj.dy += -self.dy / 2
-                                self.dx /= 2
-                                self.dy /= 2
-                        else:
-                            raise ValueError(f"\"{self.typ}\" is not a valid object type (\"rect\" or \"circle\")")
-                    elif self.typ == "circle":
-                        if obj.typ == "rect":
-                            point = rotate_point(self.x - obj.x, self.y - obj.y, math.radians(-obj.r))
-                            if abs(point[0]) > obj.width / 2 - self.width / 4:
-                                ax = math.radians(obj.r)
-                            else:
-                                ax = math.radians(obj.r) + math.pi / 2
-                            ax += ax - math.atan2(self.dy, self.dx) + math.pi
-                            self.dx = math.cos(ax) * math.hypot(self.dx, self.dy) * self.bounce * obj.bounce
-                            self.dy = math.sin(ax) * math.hypot(self.dx, self.dy)
-                            if obj.movable:
-                                obj.dx += -self.dx / 2
-                                obj.dy += -self.dy / 2
-                                self.dx /= 2
-                                self.dy /= 2
-                        elif obj.typ == "circle":
-                            ax = math.atan2(obj.y - self.y, obj.x - self.x) + math.pi
-                            ax += ax - math.atan2(self.dy, self.dx) + math.pi
-                            self.dx = math.cos(ax) * math.hypot(self.dx, self.dy)
-                            self.dy = math.sin(ax) * math.hypot(self.dx, self.dy)
-                            if obj.movable:
-                                obj.dx += -self.dx / 2
-                                obj.dy += -self.dy / 2
-                                self.dx /= 2
-                                self.dy /= 2
-                        else:
-                            raise ValueError(f"\"{self.typ}\" is not a valid object type (\"rect\" or \"circle\")")
-                    else:
-                        raise ValueError(f"\"{self.typ}\" is not a valid object type (\"rect\" or \"circle\")")
-        tm = time.time() - self.last_time
-        self.dy += self.phys.gravity * self.gravity_amp * tm
-        self.x += self.dx * tm
-        self.y += self.dy * tm
-        self.r = (self.r + self.dr * tm) % 360
-        self.dx -= self.dx * self.friction * tm
-        self.dy -= self.dy * self.friction * tm
-        self.dr -= self.dr * self.friction * tm
-        self.last_time = time.time()
+                        and (not obj.movable or idx < self_idx) and self.collides(obj)):
+                    self.bounce_off(obj)
+        self.integrate(self.phys.timestep if tm is None else tm)
+
+    def bounce_off(self, obj) -> None:
+        """
+        Change the velocities of this Object (and obj, if it is movable) after a collision with obj
+        :param obj: the Object this Object collided with
+        :return: None
+        """
+        if self.typ == "rect":
+            if obj.typ == "rect":
+                pass
+            elif obj.typ == "circle":
+                point = rotate_point(obj.x - self.x, obj.y - self.y, math.radians(-self.r))
+                if abs(point[0]) > self.width / 2 - obj.width / 4:
+                    ax = math.radians(self.r)
+                else:
+                    ax = math.radians(self.r) + math.pi / 2
+                ax += ax - math.atan2(obj.dy, obj.dx) + math.pi
+                self.dx = math.cos(ax) * math.hypot(self.dx, self.dy) * self.bounce * obj.bounce
+                self.dy = math.sin(ax) * math.hypot(self.dx, self.dy)
+                if obj.movable:
+                    obj.dx += -self.dx / 2
+                    obj.dy += -self.dy / 2
+                    self.dx /= 2
+                    self.dy /= 2
+            else:
+                raise ValueError(f"\"{self.typ}\" is not a valid object type (\"rect\" or \"circle\")")
+        elif self.typ == "circle":
+            if obj.typ == "rect":
+                point = rotate_point(self.x - obj.x, self.y - obj.y, math.radians(-obj.r))
+                if abs(point[0]) > obj.width / 2 - self.width / 4:
+                    ax = math.radians(obj.r)
+                else:
+                    ax = math.radians(obj.r) + math.pi / 2
+                ax += ax - math.atan2(self.dy, self.dx) + math.pi
+                self.dx = math.cos(ax) * math.hypot(self.dx, self.dy) * self.bounce * obj.bounce
+                self.dy = math.sin(ax) * math.hypot(self.dx, self.dy)
+                if obj.movable:
+                    obj.dx += -self.dx / 2
+                    obj.dy += -self.dy / 2
+                    self.dx /= 2
+                    self.dy /= 2
+            elif obj.typ == "circle":
+                ax = math.atan2(obj.y - self.y, obj.x - self.x) + math.pi
+                ax += ax - math.atan2(self.dy, self.dx) + math.pi
+                self.dx = math.cos(ax) * math.hypot(self.dx, self.dy)
+                self.dy = math.sin(ax) * math.hypot(self.dx, self.dy)
+                if obj.movable:
+                    obj.dx += -self.dx / 2
+                    obj.dy += -self.dy / 2
+                    self.dx /= 2
+                    self.dy /= 2
+            else:
+                raise ValueError(f"\"{self.typ}\" is not a valid object type (\"rect\" or \"circle\")")
+        else:
+            raise ValueError(f"\"{self.typ}\" is not a valid object type (\"rect\" or \"circle\")")
+
+    def integrate(self, tm: float) -> None:
+        """
+        Apply gravity, velocity and friction (no collisions)
+        :param tm: the simulated time
+        :return: None
+        """
+        x, y, dx, dy, r, dr, _, friction, gravity_amp = self.fields[:9]
+        idx = self.idx
+        dy[idx] += self.phys.gravity * gravity_amp[idx] * tm
+        x[idx] += dx[idx] * tm
+        y[idx] += dy[idx] * tm
+        r[idx] = (r[idx] + dr[idx] * tm) % 360
+        dx[idx] -= dx[idx] * friction[idx] * tm
+        dy[idx] -= dy[idx] * friction[idx] * tm
+        dr[idx] -= dr[idx] * friction[idx] * tm
+        self.geometry = None  # The fields were changed without the setters
 
     def tick(self) -> None:
         """
@@ -218,21 +618,26 @@ class Object:
         self.sim()
         self.draw()
 
+    def get_geometry(self) -> Geometry:
+        """
+        Get the cached Geometry of the Object, computed again only after it moved, rotated or was resized
+        (the setters clear it, Bodies.integrate bumps the generation of the Objects it moved)
+        :return: the Geometry
+        """
+        geometry = self.geometry
+        if geometry is None or geometry.generation != self.fields[15][self.idx]:
+            geometry = self.geometry = Geometry(self)
+        return geometry
+
+    def get_aabb(self) -> tuple[float, float, float, float]:
+        """
+        Get the axis-aligned bounding box of the Object
+        :return: (min x, min y, max x, max y)
+        """
+        return self.get_geometry().aabb
+
     def get_points(self) -> list[tuple[float, float]]:
-        if self.typ == "rect":
-            rad = math.radians(self.r)
-            p1 = rotate_point(-self.width / 2, -self.height / 2, rad)
-            p2 = rotate_point(self.width / 2, -self.height / 2, rad)
-            p3 = rotate_point(self.width / 2, self.height / 2, rad)
-            p4 = rotate_point(-self.width / 2, self.height / 2, rad)
-            return [(self.x + p1[0], self.y + p1[1]),
-                    (self.x + p2[0], self.y + p2[1]),
-                    (self.x + p3[0], self.y + p3[1]),
-                    (self.x + p4[0], self.y + p4[1])]
-        elif self.typ == "circle":
-            return [(self.x, self.y)]
-        else:
-            raise ValueError(f"\"{self.typ}\" is not a valid object type (\"rect\" or \"circle\")")
+        return self.get_geometry().points
 
     def isin(self, x: float, y: float) -> bool:
         """
@@ -242,13 +647,46 @@ class Object:
         :return: True if the point is inside the object, False otherwise
         """
         if self.typ == "rect":
-            point = rotate_point(x - self.x, y - self.y, math.radians(-self.r))
-            return -self.width / 2 <= point[0] <= self.width / 2 and -self.height / 2 <= point[1] <= self.height / 2
+            return self.contains(x, y, self.width / 2, self.height / 2)
         elif self.typ == "circle":
             return math.hypot(x - self.x, y - self.y) <= self.width / 2
         else:
             raise ValueError(f"\"{self.typ}\" is not a valid object type (\"rect\" or \"circle\")")
 
+    def contains(self, x: float, y: float, half_width: float, half_height: float) -> bool:
+        """
+        Whether a point is inside a box centered on the Object and rotated like it
+        :param x: point x
+        :param y: point y
+        :param half_width: box half width
+        :param half_height: box half height
+        :return: True if the point is inside the box, False otherwise
+        """
+        geometry = self.get_geometry()
+        x, y = x - self.x, y - self.y
+        local_x = x * geometry.cos + y * geometry.sin  # rotate_point by -r
+        local_y = -x * geometry.sin + y * geometry.cos
+        return -half_width <= local_x <= half_width and -half_height <= local_y <= half_height
+
+    def sweep(self, obj) -> float | None:
+        """
+        Find when this circle first touched another Object during the last Physics.step
+        (continuous collision detection, so fast circles can't go through thin Objects)
+        :param obj: Object to check collision with
+        :return: the time of impact (0 at the start, 1 at the end of the step), None if they didn't touch
+        """
+        if self.typ != "circle":
+            raise ValueError("Only circles can be swept")
+        dx, dy = self.x - self.prev_x, self.y - self.prev_y
+        if obj.typ == "rect":
+            return sweep_circle_rect(self.prev_x, self.prev_y, dx, dy, self.width / 2,
+                                     obj.x, obj.y, obj.width, obj.height, obj.r)
+        elif obj.typ == "circle":
+            return sweep_circle_circle(self.prev_x, self.prev_y, dx - (obj.x - obj.prev_x), dy - (obj.y - obj.prev_y),
+                                       obj.prev_x, obj.prev_y, self.width / 2 + obj.width / 2)
+        else:
+            raise ValueError(f"\"{obj.typ}\" is not a valid object type (\"rect\" or \"circle\")")
+
     def collides(self, obj) -> bool:
         """
         Check if this Object collides with another Object
@@ -257,26 +695,18 @@ class Object:
         """
         if self.typ == "rect":
             if obj.typ == "rect":  # Algorithm using the Separating Axis Theorem inspired by ChatGPT
-                axis = [(math.cos(math.radians(self.r)), math.sin(math.radians(self.r))),
-                        (math.cos(math.radians(self.r + 90)), math.sin(math.radians(self.r + 90))),
-                        (math.cos(math.radians(obj.r)), math.sin(math.radians(obj.r))),
-                        (math.cos(math.radians(obj.r + 90)), math.sin(math.radians(obj.r + 90)))]
-                points = self.get_points()
-                points_obj = obj.get_points()
-                for ax in axis:
+                geometry, geometry_obj = self.get_geometry(), obj.get_geometry()
+                points = geometry.points
+                points_obj = geometry_obj.points
+                for ax in geometry.axes + geometry_obj.axes:
                     proj = project_polygon(points, ax)
                     proj_obj = project_polygon(points_obj, ax)
                     if not (proj[0] <= proj_obj[0] <= proj[1] or proj[0] <= proj_obj[1] <= proj[1] or
                             proj_obj[0] <= proj[0] <= proj_obj[1] or proj_obj[0] <= proj[1] <= proj_obj[1]):
                         return False
                 return True
-            elif obj.typ == "circle":  # Not very precise
-                self.width += obj.width
-                self.height += obj.width
-                ans = self.isin(obj.x, obj.y)
-                self.width -= obj.width
-                self.height -= obj.width
-                return ans
+            elif obj.typ == "circle":  # Not very precise: the rect expanded by the circle's width
+                return self.contains(obj.x, obj.y, (self.width + obj.width) / 2, (self.height + obj.width) / 2)
             else:
                 raise ValueError(f"\"{self.typ}\" is not a valid object type (\"rect\" or \"circle\")")
         elif self.typ == "circle":
@@ -290,6 +720,530 @@ class Object:
             raise ValueError(f"\"{self.typ}\" is not a valid object type (\"rect\" or \"circle\")")
 
 
+class Bodies:
+    """
+    The state of all Objects of a Physics, as one array per field (structure of arrays).
+    Lists are faster for a few Objects, NumPy arrays allow integrating all of them at once
+    """
+
+    FIELDS = ("x", "y", "dx", "dy", "r", "dr", "mass", "friction", "gravity_amp", "prev_x", "prev_y", "prev_r",
+              "still_time", "movable", "radius", "generation")
+
+    def __init__(self, vectorized: bool = False, capacity: int = 64) -> None:
+        """
+        Initiate the Bodies
+        :param vectorized: if True, uses float64 NumPy arrays, otherwise lists
+        :param capacity: initial capacity of the NumPy arrays (they grow when full)
+        """
+        self.vectorized: bool = vectorized
+        if self.vectorized:
+            self.arrays: list[np.ndarray] = [np.zeros(capacity) for _ in self.FIELDS]
+            # What the Objects use: a memoryview gives Python floats, much faster to compute with than NumPy scalars
+            self.fields: list = [memoryview(array) for array in self.arrays]
+            self.active = np.zeros(capacity)  # 1 for awake Objects, 0 for sleeping ones and free slots
+        else:
+            self.fields: list = [[] for _ in self.FIELDS]
+            self.active = []
+        self.count: int = 0
+        self.free: list[int] = []
+
+    def alloc(self) -> int:
+        """
+        Get a slot for a new Object
+        :return: the slot index
+        """
+        if self.free:
+            idx = self.free.pop()
+            self.active[idx] = 1.0
+            return idx
+        idx = self.count
+        self.count += 1
+        if not self.vectorized:
+            for field in self.fields:
+                field.append(0.0)
+            self.active.append(1.0)
+            return idx
+        if idx == len(self.arrays[0]):
+            for num, array in enumerate(self.arrays):  # Replace in place, Objects keep a reference to the list
+                self.arrays[num] = np.concatenate((array, np.zeros(len(array))))
+                self.fields[num] = memoryview(self.arrays[num])
+            self.active = np.concatenate((self.active, np.zeros(len(self.active))))
+        self.active[idx] = 1.0
+        return idx
+
+    def release(self, idx: int) -> None:
+        """
+        Free the slot of a removed Object
+        :param idx: the slot index
+        :return: None
+        """
+        for field in self.fields:
+            field[idx] = 0.0
+        self.active[idx] = 0.0
+        self.free.append(idx)
+
+    def save_previous(self, idxs: list[int] | None = None) -> None:
+        """
+        Copy x, y and r to prev_x, prev_y and prev_r (used for interpolation)
+        :param idxs: the slots to copy (ignored if vectorized, copying all of them is faster), None for all of them
+        :return: None
+        """
+        n = self.count
+        for src, dst in ((0, 9), (1, 10), (4, 11)):
+            if self.vectorized:
+                self.arrays[dst][:n] = self.arrays[src][:n]
+            elif idxs is None:
+                self.fields[dst][:n] = self.fields[src][:n]
+            else:
+                src, dst = self.fields[src], self.fields[dst]
+                for idx in idxs:
+                    dst[idx] = src[idx]
+
+    def integrate(self, gravity: float, tm: float) -> None:
+        """
+        Apply gravity, velocity and friction to all awake Objects at once, and bump the generation of the ones that
+        moved since Bodies.save_previous, so their cached Geometry is computed again (only if vectorized)
+        :param gravity: Physics.gravity
+        :param tm: time since the last integration
+        :return: None
+        """
+        n = self.count
+        x, y, dx, dy, r, dr, _, friction, gravity_amp = (array[:n] for array in self.arrays[:9])
+        dy += gravity * tm * gravity_amp * self.active[:n]  # Sleeping Objects have no velocity, only gravity is left
+        x += dx * tm
+        y += dy * tm
+        r += dr * tm
+        np.mod(r, 360, out=r)
+        damping = 1 - friction * tm
+        dx *= damping
+        dy *= damping
+        dr *= damping
+        prev_x, prev_y, prev_r, generation = (self.arrays[field][:n] for field in (9, 10, 11, 15))
+        generation += (x != prev_x) | (y != prev_y) | (r != prev_r)
+
+    def settle(self, tm: float, sleep_speed: float, sleep_time: float) -> list[int]:
+        """
+        Count how long the awake Objects have been still, like Physics.settle, all at once (only if vectorized)
+        :param tm: the simulated time
+        :param sleep_speed: Physics.sleep_speed
+        :param sleep_time: Physics.sleep_time
+        :return: the slots of the Objects that fall asleep
+        """
+        n = self.count
+        dx, dy, dr, gravity_amp, still_time, movable = (self.arrays[field][:n] for field in (2, 3, 5, 8, 12, 13))
+        awake = self.active[:n] != 0
+        moving = awake & (movable != 0)
+        if sleep_time:
+            still = moving & (np.hypot(dx, dy) < sleep_speed) & (np.abs(dr) < sleep_speed)
+            still_time[still] += tm
+            still_time[moving & ~still] = 0
+            asleep = still & (still_time >= sleep_time)
+        else:
+            still_time[moving] = 0
+            asleep = np.zeros(n, dtype=bool)
+        asleep |= awake & (movable == 0) & (dx == 0) & (dy == 0) & (dr == 0) & (gravity_amp == 0)
+        return np.flatnonzero(asleep).tolist()
+
+    def fast(self) -> list[int]:
+        """
+        Find the awake circles that moved more than their radius since Bodies.save_previous (see Physics.sweep),
+        all at once (only if vectorized)
+        :return: their slots
+        """
+        n = self.count
+        x, y, prev_x, prev_y, radius = (self.arrays[field][:n] for field in (0, 1, 9, 10, 14))
+        return np.flatnonzero((self.active[:n] != 0) & (np.hypot(x - prev_x, y - prev_y) > radius)).tolist()
+
+
+class Broadphase(ABC):
+    """
+    Finds pairs of Objects that might collide, so that Object.collides is only called for them
+    """
+
+    @abstractmethod
+    def pairs(self, objs: list[Object]) -> list[tuple[int, int]]:
+        """
+        Find the pairs of Objects with hitboxes that might collide
+        :param objs: the Objects to pair (Physics.active, the awake ones)
+        :return: (i, j) indexes into objs with i < j, sorted by j, then i
+        """
+
+
+class BruteForce(Broadphase):
+    """
+    Returns every pair of Objects with hitboxes (O(n²), but has no overhead for a few Objects)
+    """
+
+    def pairs(self, objs: list[Object]) -> list[tuple[int, int]]:
+        idxs = [idx for idx, obj in enumerate(objs) if obj.hitbox]
+        return [(i, j) for n, j in enumerate(idxs) for i in idxs[:n]]
+
+
+class SpatialHash(Broadphase):
+    """
+    A uniform grid of cells, rebuilt every step, where each Object is put in all the cells its bounding box touches.
+    Only Objects sharing a cell and with overlapping bounding boxes are returned as pairs
+    """
+
+    def __init__(self, cell_size: float = 64) -> None:
+        """
+        Initiate the SpatialHash
+        :param cell_size: the size of a cell, should be around the size of a typical Object
+        """
+        self.cell_size: float = cell_size
+
+    def pairs(self, objs: list[Object]) -> list[tuple[int, int]]:
+        size = self.cell_size
+        cells: dict[tuple[int, int], list[int]] = {}
+        aabbs: dict[int, tuple[float, float, float, float]] = {}
+        found: set[tuple[int, int]] = set()
+        for idx, obj in enumerate(objs):
+            if not obj.hitbox:
+                continue
+            x0, y0, x1, y1 = aabbs[idx] = broadphase_aabb(obj)
+            for cx in range(int(x0 // size), int(x1 // size) + 1):
+                for cy in range(int(y0 // size), int(y1 // size) + 1):
+                    cell = cells.get((cx, cy))
+                    if cell is None:
+                        cells[cx, cy] = [idx]
+                        continue
+                    for other in cell:
+                        ox0, oy0, ox1, oy1 = aabbs[other]
+                        if ox0 <= x1 and x0 <= ox1 and oy0 <= y1 and y0 <= oy1:
+                            found.add((other, idx))
+                    cell.append(idx)
+        return sorted(found, key=lambda pair: (pair[1], pair[0]))
+
+
+class Node:
+    """
+    A node of an AABBTree: a leaf holds an Object, a branch holds two children and the bounding box of both
+    """
+
+    __slots__ = ("aabb", "obj", "parent", "left", "right", "height")
+
+    def __init__(self, aabb: tuple[float, float, float, float], obj: "Object | None" = None) -> None:
+        """
+        Initiate the Node
+        :param aabb: (min x, min y, max x, max y)
+        :param obj: the Object of a leaf, None for a branch
+        """
+        self.aabb: tuple[float, float, float, float] = aabb
+        self.obj: Object | None = obj
+        self.parent: Node | None = None
+        self.left: Node | None = None
+        self.right: Node | None = None
+        self.height: int = 0  # 0 for a leaf
+
+
+class AABBTree:
+    """
+    A dynamic bounding volume hierarchy: a balanced binary tree of bounding boxes, with the Objects in its leaves.
+    Objects can be inserted, removed and refitted one at a time, and finding the ones around an area, at a point
+    or along a ray takes logarithmic time, whatever their sizes (used for the sleeping Objects of a Physics)
+    """
+
+    def __init__(self, margin: float = 0) -> None:
+        """
+        Initiate the AABBTree
+        :param margin: how much the leaves are bigger than their Objects, so AABBTree.refit doesn't have to move them
+        every time a slow Object moves a little
+        """
+        self.margin: float = margin
+        self.root: Node | None = None
+        self.leaves: dict[Object, Node] = {}
+
+    def __len__(self) -> int:
+        return len(self.leaves)
+
+    def __contains__(self, obj: "Object") -> bool:
+        return obj in self.leaves
+
+    def height(self) -> int:
+        """
+        Get the height of the tree
+        :return: the number of branches from the root to the deepest leaf
+        """
+        return self.root.height if self.root is not None else 0
+
+    def insert(self, obj: "Object") -> None:
+        """
+        Add an Object, with its current bounding box
+        :param obj: the Object
+        :return: None
+        """
+        x0, y0, x1, y1 = broadphase_aabb(obj)
+        margin = self.margin
+        leaf = self.leaves[obj] = Node((x0 - margin, y0 - margin, x1 + margin, y1 + margin), obj)
+        self.insert_leaf(leaf)
+
+    def remove(self, obj: "Object") -> None:
+        """
+        Remove an Object (does nothing if it isn't in the tree)
+        :param obj: the Object
+        :return: None
+        """
+        leaf = self.leaves.pop(obj, None)
+        if leaf is not None:
+            self.remove_leaf(leaf)
+
+    def refit(self, obj: "Object") -> bool:
+        """
+        Update the bounding box of an Object that moved (its leaf is only moved if it doesn't fit anymore)
+        :param obj: the Object
+        :return: True if the leaf was moved, False otherwise
+        """
+        leaf = self.leaves[obj]
+        x0, y0, x1, y1 = broadphase_aabb(obj)
+        lx0, ly0, lx1, ly1 = leaf.aabb
+        if lx0 <= x0 and ly0 <= y0 and x1 <= lx1 and y1 <= ly1:
+            return False
+        self.remove_leaf(leaf)
+        margin = self.margin
+        leaf.aabb = x0 - margin, y0 - margin, x1 + margin, y1 + margin
+        self.insert_leaf(leaf)
+        return True
+
+    def query(self, x0: float, y0: float, x1: float, y1: float) -> list["Object"]:
+        """
+        Find the Objects whose bounding box overlaps an area
+        :param x0: min x
+        :param y0: min y
+        :param x1: max x
+        :param y1: max y
+        :return: the Objects
+        """
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            nx0, ny0, nx1, ny1 = node.aabb
+            if not (nx0 <= x1 and x0 <= nx1 and ny0 <= y1 and y0 <= ny1):
+                continue
+            if node.obj is not None:
+                found.append(node.obj)
+            else:
+                stack.append(node.right)
+                stack.append(node.left)
+        return found
+
+    def point(self, x: float, y: float) -> list["Object"]:
+        """
+        Find the Objects a point is inside of (see Object.isin)
+        :param x: point x
+        :param y: point y
+        :return: the Objects
+        """
+        return [obj for obj in self.query(x, y, x, y) if obj.isin(x, y)]
+
+    def ray(self, x: float, y: float, dx: float, dy: float) -> list[tuple[float, "Object"]]:
+        """
+        Find the Objects a segment goes through
+        :param x: start x
+        :param y: start y
+        :param dx: segment x length
+        :param dy: segment y length
+        :return: (time of impact, Object) for every Object, sorted by the time of impact
+        (0 at the start, 1 at the end of the segment)
+        """
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            nx0, ny0, nx1, ny1 = node.aabb
+            if sweep_point_box(x - (nx0 + nx1) / 2, y - (ny0 + ny1) / 2, dx, dy,
+                               (nx1 - nx0) / 2, (ny1 - ny0) / 2) is None:
+                continue
+            obj = node.obj
+            if obj is None:
+                stack.append(node.right)
+                stack.append(node.left)
+            elif obj.typ == "rect":
+                toi = sweep_circle_rect(x, y, dx, dy, 0, obj.x, obj.y, obj.width, obj.height, obj.r)
+                if toi is not None:
+                    found.append((toi, obj))
+            elif obj.typ == "circle":
+                toi = sweep_circle_circle(x, y, dx, dy, obj.x, obj.y, obj.width / 2)
+                if toi is not None:
+                    found.append((toi, obj))
+        found.sort(key=lambda hit: (hit[0], hit[1].order))
+        return found
+
+    def insert_leaf(self, leaf: Node) -> None:
+        """
+        Put a leaf next to the Node that makes the tree grow the least, then rebalance the tree
+        :param leaf: the leaf
+        :return: None
+        """
+        if self.root is None:
+            self.root = leaf
+            leaf.parent = None
+            return
+        aabb = leaf.aabb
+        node = self.root
+        while node.obj is None:  # Find the best sibling (the surface area heuristic, with perimeters in 2D)
+            combined = perimeter(union(node.aabb, aabb))
+            cost = 2 * combined  # Making a new parent for this Node and the leaf
+            inherited = 2 * (combined - perimeter(node.aabb))  # What every Node below would add to it
+            cost_left = perimeter(union(node.left.aabb, aabb)) + inherited
+            cost_right = perimeter(union(node.right.aabb, aabb)) + inherited
+            if node.left.obj is None:
+                cost_left -= perimeter(node.left.aabb)
+            if node.right.obj is None:
+                cost_right -= perimeter(node.right.aabb)
+            if cost < cost_left and cost < cost_right:
+                break
+            node = node.left if cost_left < cost_right else node.right
+        sibling = node
+        old_parent = sibling.parent
+        parent = Node(union(sibling.aabb, aabb))
+        parent.parent = old_parent
+        parent.height = sibling.height + 1
+        parent.left, parent.right = sibling, leaf
+        sibling.parent = leaf.parent = parent
+        if old_parent is None:
+            self.root = parent
+        elif old_parent.left is sibling:
+            old_parent.left = parent
+        else:
+            old_parent.right = parent
+        self.fix_upwards(parent)
+
+    def remove_leaf(self, leaf: Node) -> None:
+        """
+        Take a leaf out of the tree (its parent is replaced by its sibling), then rebalance the tree
+        :param leaf: the leaf
+        :return: None
+        """
+        if leaf is self.root:
+            self.root = None
+            return
+        parent = leaf.parent
+        grandparent = parent.parent
+        sibling = parent.left if parent.right is leaf else parent.right
+        sibling.parent = grandparent
+        leaf.parent = None
+        if grandparent is None:
+            self.root = sibling
+            return
+        if grandparent.left is parent:
+            grandparent.left = sibling
+        else:
+            grandparent.right = sibling
+        self.fix_upwards(grandparent)
+
+    def fix_upwards(self, node: Node | None) -> None:
+        """
+        Rebalance and update the bounding boxes and heights of a Node and all the Nodes above it
+        :param node: the lowest Node that changed
+        :return: None
+        """
+        while node is not None:
+            node = self.balance(node)
+            left, right = node.left, node.right
+            node.height = 1 + max(left.height, right.height)
+            node.aabb = union(left.aabb, right.aabb)
+            node = node.parent
+
+    def balance(self, a: Node) -> Node:
+        """
+        Rotate a branch whose children's heights differ by more than 1, so the tree stays balanced
+        :param a: the branch
+        :return: the Node now at the place of the branch
+        """
+        if a.obj is not None or a.height < 2:
+            return a
+        b, c = a.left, a.right
+        diff = c.height - b.height
+        if diff > 1:
+            return self.rotate(a, c, b, right=True)
+        if diff < -1:
+            return self.rotate(a, b, c, right=False)
+        return a
+
+    def rotate(self, a: Node, up: Node, other: Node, right: bool) -> Node:
+        """
+        Move the higher child of a branch up in its place (an AVL rotation)
+        :param a: the branch
+        :param up: the higher child of a
+        :param other: the other child of a
+        :param right: whether up is the right child of a
+        :return: up
+        """
+        f, g = up.left, up.right
+        up.left = a
+        up.parent = a.parent
+        a.parent = up
+        if up.parent is None:
+            self.root = up
+        elif up.parent.left is a:
+            up.parent.left = up
+        else:
+            up.parent.right = up
+        if f.height > g.height:  # The higher grandchild stays under up, the other one goes under a
+            up.right, moved = f, g
+        else:
+            up.right, moved = g, f
+        if right:
+            a.right = moved
+        else:
+            a.left = moved
+        moved.parent = a
+        a.aabb = union(other.aabb, moved.aabb)
+        a.height = 1 + max(other.height, moved.height)
+        up.aabb = union(a.aabb, up.right.aabb)
+        up.height = 1 + max(a.height, up.right.height)
+        return up
+
+
+def union(a: tuple[float, float, float, float],
+          b: tuple[float, float, float, float]) -> tuple[float, float, float, float]:
+    """
+    Get the bounding box of two bounding boxes
+    :param a: (min x, min y, max x, max y)
+    :param b: (min x, min y, max x, max y)
+    :return: (min x, min y, max x, max y)
+    """
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+
+def perimeter(aabb: tuple[float, float, float, float]) -> float:
+    """
+    Get the perimeter of a bounding box (the 2D surface area heuristic)
+    :param aabb: (min x, min y, max x, max y)
+    :return: the perimeter
+    """
+    return 2 * (aabb[2] - aabb[0] + aabb[3] - aabb[1])
+
+
+def swept_aabb(obj: Object) -> tuple[float, float, float, float]:
+    """
+    Get the bounding box of what an Object went through during the last Physics.step (only circles are swept,
+    see Physics.sweep)
+    :param obj: the Object
+    :return: (min x, min y, max x, max y)
+    """
+    x0, y0, x1, y1 = obj.get_aabb()
+    if obj.typ == "circle":
+        x0, y0 = min(x0, obj.prev_x - obj.width / 2), min(y0, obj.prev_y - obj.width / 2)
+        x1, y1 = max(x1, obj.prev_x + obj.width / 2), max(y1, obj.prev_y + obj.width / 2)
+    return x0, y0, x1, y1
+
+
+def broadphase_aabb(obj: Object) -> tuple[float, float, float, float]:
+    """
+    Get the bounding box an Object has in the broadphase: circles are padded, because the rect-circle collision
+    expands the rect by the circle's width
+    :param obj: the Object
+    :return: (min x, min y, max x, max y)
+    """
+    x0, y0, x1, y1 = obj.get_aabb()
+    if obj.typ == "circle":
+        pad = obj.width * (math.sqrt(2) - 1) / 2
+        return x0 - pad, y0 - pad, x1 + pad, y1 + pad
+    return x0, y0, x1, y1
+
+
 def minmax(val: float, mn: float, mx: float) -> float:
     """
     Bind a value to a range
@@ -312,6 +1266,104 @@ def rotate_point(x: float, y: float, r: float) -> tuple[float, float]:
     return x * math.cos(r) - y * math.sin(r), x * math.sin(r) + y * math.cos(r)
 
 
+def rect_points(x: float, y: float, width: float, height: float, r: float) -> list[tuple[float, float]]:
+    """
+    Get the corners of a rotated rectangle
+    :param x: center x
+    :param y: center y
+    :param width: rectangle width
+    :param height: rectangle height
+    :param r: rotation in degrees
+    :return: the 4 corners
+    """
+    rad = math.radians(r)
+    p1 = rotate_point(-width / 2, -height / 2, rad)
+    p2 = rotate_point(width / 2, -height / 2, rad)
+    p3 = rotate_point(width / 2, height / 2, rad)
+    p4 = rotate_point(-width / 2, height / 2, rad)
+    return [(x + p1[0], y + p1[1]),
+            (x + p2[0], y + p2[1]),
+            (x + p3[0], y + p3[1]),
+            (x + p4[0], y + p4[1])]
+
+
+def sweep_circle_circle(x: float, y: float, dx: float, dy: float, cx: float, cy: float,
+                        radius: float) -> float | None:
+    """
+    Find when a moving point first touches a circle (a moving circle against another circle of radius radius minus
+    its own radius; for two moving circles, use the difference of their movements)
+    :param x: start x
+    :param y: start y
+    :param dx: movement x
+    :param dy: movement y
+    :param cx: circle center x
+    :param cy: circle center y
+    :param radius: circle radius
+    :return: the time of impact (0 at the start, 1 at the end of the movement), None if it doesn't touch the circle
+    """
+    fx, fy = x - cx, y - cy
+    c = fx * fx + fy * fy - radius * radius
+    if c <= 0:  # Already touching
+        return 0
+    a = dx * dx + dy * dy
+    b = 2 * (fx * dx + fy * dy)
+    disc = b * b - 4 * a * c
+    if a == 0 or b >= 0 or disc < 0:  # Not moving, moving away or missing it
+        return None
+    t = (-b - math.sqrt(disc)) / (2 * a)
+    return t if t <= 1 else None
+
+
+def sweep_point_box(x: float, y: float, dx: float, dy: float, half_width: float,
+                    half_height: float) -> float | None:
+    """
+    Find when a moving point first enters a box centered on (0, 0)
+    :param x: start x
+    :param y: start y
+    :param dx: movement x
+    :param dy: movement y
+    :param half_width: box half width
+    :param half_height: box half height
+    :return: the time of impact (0 at the start, 1 at the end of the movement), None if it doesn't enter the box
+    """
+    enter, leave = 0., 1.
+    for start, move, half in ((x, dx, half_width), (y, dy, half_height)):
+        if move == 0:
+            if not -half <= start <= half:
+                return None
+            continue
+        t0, t1 = (-half - start) / move, (half - start) / move
+        if t0 > t1:
+            t0, t1 = t1, t0
+        enter, leave = max(enter, t0), min(leave, t1)
+        if enter > leave:
+            return None
+    return enter
+
+
+def sweep_circle_rect(x: float, y: float, dx: float, dy: float, radius: float, rx: float, ry: float, width: float,
+                      height: float, r: float) -> float | None:
+    """
+    Find when a moving circle first touches a rotated rectangle (the rectangle is expanded by the radius, like in
+    Object.collides)
+    :param x: circle start x
+    :param y: circle start y
+    :param dx: circle movement x
+    :param dy: circle movement y
+    :param radius: circle radius
+    :param rx: rectangle center x
+    :param ry: rectangle center y
+    :param width: rectangle width
+    :param height: rectangle height
+    :param r: rectangle rotation in degrees
+    :return: the time of impact (0 at the start, 1 at the end of the movement), None if it doesn't touch it
+    """
+    rad = math.radians(-r)
+    x, y = rotate_point(x - rx, y - ry, rad)
+    dx, dy = rotate_point(dx, dy, rad)
+    return sweep_point_box(x, y, dx, dy, width / 2 + radius, height / 2 + radius)
+
+
 def project_polygon(points: list[tuple[float, float]], axis: tuple[float, float]) -> tuple[float, float]:
     """
     Made by ChatGPT
@@ -321,15 +1373,9 @@ def project_polygon(points: list[tuple[float, float]], axis: tuple[float, float]
     :param axis: axis to project on
     :return: (projection start, projection end)
     """
-    min_p = float("inf")
-    max_p = float("-inf")
-
-    for x, y in points:
-        projection = x * axis[0] + y * axis[1]  # dot product
-        min_p = min(min_p, projection)
-        max_p = max(max_p, projection)
-
-    return min_p, max_p
+    ax, ay = axis
+    projections = [x * ax + y * ay for x, y in points]  # dot products
+    return min(projections), max(projections)
 
 
 if __name__ == "__main__":
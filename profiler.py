@@ -0,0 +1,267 @@
+"""
+Frame timers and an on-screen performance overlay.
+PROFILER is disabled by default, then timing costs a single attribute check
+"""
+from contextlib import nullcontext
+from tkinter import Canvas
+from renderer import Renderer
+import time
+
+
+class Timer:
+    """
+    The durations of the last frames, in a ring buffer
+    """
+
+    def __init__(self, size: int = 240) -> None:
+        """
+        Initiate the Timer
+        :param size: how many durations are kept
+        """
+        self.durations: list[float] = [0.] * size
+        self.index: int = 0
+        self.count: int = 0
+        self.start: float = 0
+
+    def __enter__(self) -> "Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.add(time.perf_counter() - self.start)
+
+    def add(self, duration: float) -> None:
+        """
+        Record a duration (the oldest one is forgotten once the buffer is full)
+        :param duration: the duration in seconds
+        :return: None
+        """
+        self.durations[self.index] = duration
+        self.index = (self.index + 1) % len(self.durations)
+        self.count = min(self.count + 1, len(self.durations))
+
+    def values(self) -> list[float]:
+        """
+        Get the recorded durations
+        :return: the durations in seconds, oldest first
+        """
+        if self.count < len(self.durations):
+            return self.durations[:self.count]
+        return self.durations[self.index:] + self.durations[:self.index]
+
+    def percentile(self, p: float) -> float:
+        """
+        Get a percentile of the recorded durations
+        :param p: the percentile (0 to 100)
+        :return: the duration in seconds, 0 if nothing was recorded
+        """
+        if not self.count:
+            return 0
+        values = sorted(self.durations[:self.count])
+        return values[min(self.count - 1, int(self.count * p / 100))]
+
+    def mean(self) -> float:
+        """
+        Get the mean of the recorded durations
+        :return: the mean in seconds, 0 if nothing was recorded
+        """
+        return sum(self.durations[:self.count]) / self.count if self.count else 0
+
+
+class Rate:
+    """
+    Counts events per second
+    """
+
+    def __init__(self, window: float = 1) -> None:
+        """
+        Initiate the Rate
+        :param window: how often the rate is updated (in seconds)
+        """
+        self.window: float = window
+        self.count: int = 0
+        self.start: float = time.perf_counter()
+        self.rate: float = 0
+
+    def add(self, count: int = 1) -> None:
+        """
+        Count events
+        :param count: the number of events
+        :return: None
+        """
+        self.count += count
+        now = time.perf_counter()
+        if now - self.start >= self.window:
+            self.rate = self.count / (now - self.start)
+            self.count = 0
+            self.start = now
+
+
+class Profiler:
+    """
+    Named Timers, Rates and values, that do nothing while Profiler.enabled is False
+    """
+
+    def __init__(self, enabled: bool = False, size: int = 240) -> None:
+        """
+        Initiate the Profiler
+        :param enabled: whether to record anything
+        :param size: how many durations every Timer keeps
+        """
+        self.enabled: bool = enabled
+        self.size: int = size
+        self.timers: dict[str, Timer] = {}
+        self.rates: dict[str, Rate] = {}
+        self.values: dict[str, float] = {}
+        self.last_frame: float | None = None
+
+    def timer(self, name: str) -> Timer:
+        """
+        Get a Timer, create it if it doesn't exist
+        :param name: the Timer name
+        :return: the Timer
+        """
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = Timer(self.size)
+        return timer
+
+    def time(self, name: str) -> Timer | nullcontext:
+        """
+        Time a block: with PROFILER.time("draw"): ...
+        :param name: the Timer name
+        :return: a context manager
+        """
+        if not self.enabled:
+            return _DISABLED
+        return self.timer(name)
+
+    def frame(self) -> None:
+        """
+        Record the time since the last frame in the "frame" Timer (call it once per frame)
+        :return: None
+        """
+        if not self.enabled:
+            self.last_frame = None
+            return
+        now = time.perf_counter()
+        if self.last_frame is not None:
+            self.timer("frame").add(now - self.last_frame)
+        self.last_frame = now
+
+    def count(self, name: str, count: int = 1) -> None:
+        """
+        Count events, like received packets
+        :param name: the Rate name
+        :param count: the number of events
+        :return: None
+        """
+        if not self.enabled:
+            return
+        rate = self.rates.get(name)
+        if rate is None:
+            rate = self.rates[name] = Rate()
+        rate.add(count)
+
+    def set(self, name: str, value: float) -> None:
+        """
+        Record a measured value, like the round trip time
+        :param name: the value name
+        :param value: the value
+        :return: None
+        """
+        if self.enabled:
+            self.values[name] = value
+
+    def stats(self, name: str) -> dict[str, float]:
+        """
+        Get the statistics of a Timer
+        :param name: the Timer name
+        :return: the mean, p50, p95, p99 and max in milliseconds
+        """
+        timer = self.timer(name)
+        return {"mean": timer.mean() * 1000, "p50": timer.percentile(50) * 1000, "p95": timer.percentile(95) * 1000,
+                "p99": timer.percentile(99) * 1000, "max": timer.percentile(100) * 1000}
+
+    def fps(self) -> float:
+        """
+        Get the frames per second
+        :return: the FPS over the recorded frames
+        """
+        mean = self.timer("frame").mean()
+        return 1 / mean if mean else 0
+
+    def rate(self, name: str) -> float:
+        """
+        Get the events per second of a Rate
+        :param name: the Rate name
+        :return: the events per second
+        """
+        rate = self.rates.get(name)
+        return rate.rate if rate is not None else 0
+
+
+_DISABLED = nullcontext()
+PROFILER = Profiler()
+
+
+class Overlay:
+    """
+    Shows the FPS, simulation and drawing times, round trip time and packets per second of a Profiler on a Canvas
+    """
+
+    def __init__(self, canv: Canvas, profiler: Profiler = PROFILER, x: float = 10, y: float = 30,
+                 interval: float = 0.25) -> None:
+        """
+        Initiate the Overlay
+        :param canv: the tkinter.Canvas to draw on
+        :param profiler: the Profiler to show
+        :param x: the text's top left x
+        :param y: the text's top left y
+        :param interval: how often the text is updated (in seconds)
+        """
+        self.renderer: Renderer = Renderer(canv)
+        self.profiler: Profiler = profiler
+        self.x: float = x
+        self.y: float = y
+        self.interval: float = interval
+        self.last_update: float = 0
+
+    @property
+    def shown(self) -> bool:
+        """
+        Whether the Overlay (and its Profiler) is on
+        """
+        return self.profiler.enabled
+
+    def toggle(self) -> None:
+        """
+        Show or hide the Overlay, and enable or disable its Profiler
+        :return: None
+        """
+        self.profiler.enabled = not self.profiler.enabled
+        if not self.profiler.enabled:
+            self.renderer.clear()
+
+    def draw(self) -> None:
+        """
+        Update the text (at most every Overlay.interval seconds)
+        :return: None
+        """
+        if not self.profiler.enabled:
+            return
+        now = time.perf_counter()
+        if now - self.last_update < self.interval:
+            return
+        self.last_update = now
+        profiler = self.profiler
+        sim = profiler.stats("sim")
+        draw = profiler.stats("draw")
+        lines = [f"FPS {profiler.fps():.0f}",
+                 f"sim {sim['mean']:.2f} ms (p99 {sim['p99']:.2f})",
+                 f"draw {draw['mean']:.2f} ms (p99 {draw['p99']:.2f})"]
+        if "rtt" in profiler.values:
+            lines.append(f"RTT {profiler.values['rtt'] * 1000:.0f} ms")
+        if profiler.rates:
+            lines.append(f"{profiler.rate('packets'):.0f} pkts/s")
+        self.renderer.text("overlay", self.x, self.y, text="\n".join(lines), anchor="nw", font=("TkFixedFont", 9))
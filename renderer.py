@@ -0,0 +1,97 @@
+﻿from tkinter import Canvas
+from typing import Hashable
+
+
+class Renderer:
+    """
+    Draws on a tkinter.Canvas in retained mode: every item is created once and is only moved or reconfigured
+    when it changes, which is much cheaper than deleting and recreating everything every frame
+    """
+
+    def __init__(self, canv: Canvas) -> None:
+        """
+        Initiate the Renderer
+        :param canv: the tkinter.Canvas to draw on
+        """
+        self.canv: Canvas = canv
+        self.items: dict[Hashable, list] = {}  # key: [item id, coords, options]
+
+    def oval(self, key: Hashable, *coords: float, below: str | None = None, **options) -> int:
+        """
+        Draw an oval
+        :param key: anything identifying the oval between frames
+        :param coords: x0, y0, x1, y1
+        :param below: when the item is created, put it below the items with this tag
+        :param options: Canvas.create_oval options
+        :return: the item id
+        """
+        return self._draw("oval", key, coords, below, options)
+
+    def rectangle(self, key: Hashable, *coords: float, below: str | None = None, **options) -> int:
+        """
+        Draw a rectangle
+        :param key: anything identifying the rectangle between frames
+        :param coords: x0, y0, x1, y1
+        :param below: when the item is created, put it below the items with this tag
+        :param options: Canvas.create_rectangle options
+        :return: the item id
+        """
+        return self._draw("rectangle", key, coords, below, options)
+
+    def polygon(self, key: Hashable, points: list[tuple[float, float]], below: str | None = None,
+                **options) -> int:
+        """
+        Draw a polygon
+        :param key: anything identifying the polygon between frames
+        :param points: the polygon points
+        :param below: when the item is created, put it below the items with this tag
+        :param options: Canvas.create_polygon options
+        :return: the item id
+        """
+        return self._draw("polygon", key, tuple(coord for point in points for coord in point), below, options)
+
+    def text(self, key: Hashable, *coords: float, below: str | None = None, **options) -> int:
+        """
+        Draw a text
+        :param key: anything identifying the text between frames
+        :param coords: x, y
+        :param below: when the item is created, put it below the items with this tag
+        :param options: Canvas.create_text options
+        :return: the item id
+        """
+        return self._draw("text", key, coords, below, options)
+
+    def delete(self, key: Hashable) -> None:
+        """
+        Delete an item (does nothing if it was never drawn)
+        :param key: the key the item was drawn with
+        :return: None
+        """
+        item = self.items.pop(key, None)
+        if item is not None:
+            self.canv.delete(item[0])
+
+    def clear(self) -> None:
+        """
+        Delete all items drawn by this Renderer
+        :return: None
+        """
+        for item in self.items.values():
+            self.canv.delete(item[0])
+        self.items.clear()
+
+    def _draw(self, kind: str, key: Hashable, coords: tuple, below: str | None, options: dict) -> int:
+        item = self.items.get(key)
+        if item is None:
+            item_id = getattr(self.canv, "create_" + kind)(*coords, **options)
+            if below is not None and self.canv.find_withtag(below):
+                self.canv.tag_lower(item_id, below)
+            self.items[key] = [item_id, coords, options]
+            return item_id
+        if item[1] != coords:
+            self.canv.coords(item[0], *coords)
+            item[1] = coords
+        if item[2] != options:
+            self.canv.itemconfig(item[0], **options)
+            item[2] = options
+        return item[0]
@@ -0,0 +1,470 @@
+﻿"""
+Record matches to compact binary replay files, and play them back with fast seeking.
+A replay is a header, then records: runs of ticks with both players' Inputs, changes that came from the network,
+and a keyframe of the whole GameState every KEYFRAME_INTERVAL ticks. The keyframe index is written at the end,
+so seeking only simulates from the nearest keyframe.
+Watch a replay: python replay.py <file>
+"""
+from game import COLOURS, GameState, Inputs, Tank, TIMESTEP
+import mmap
+import os
+import struct
+import time
+
+MAGIC = b"CWRP"
+INDEX_MAGIC = b"CWIX"
+REPLAY_VERSION = 1
+KEYFRAME_INTERVAL = 240  # ticks between keyframes (2 seconds)
+
+HEADER = struct.Struct("<4sBdI")  # magic, version, timestep, keyframe interval
+TICKS = struct.Struct("<HBB")  # tick count, p1 inputs, p2 inputs
+KEYFRAME = struct.Struct("<IdIH")  # tick, time, next ball id, ball count
+KEY_TANK = struct.Struct("<10d")  # x, dx, y, dy, r, dr, recoil, drecoil, health, last_shot
+KEY_BALL = struct.Struct("<I4dB")  # id, x, y, dx, dy, colour
+SET_TANK = struct.Struct("<B9d")  # player, x, dx, y, dy, r, dr, recoil, drecoil, health
+DESPAWN = struct.Struct("<IB")  # id, colour
+KEEP = struct.Struct("<BI")  # colour, id count
+KEEP_ID = struct.Struct("<I")
+INDEX_ENTRY = struct.Struct("<IQ")  # tick, offset
+FOOTER = struct.Struct("<QI4s")  # index offset, keyframe count, magic
+NO_INPUTS = 0xff  # the player isn't controlled here (their Tank is set by SET_TANK records)
+REPLAY_DIR = "replays"
+
+
+def new_path(directory: str = REPLAY_DIR) -> str:
+    """
+    Get the file name of a new replay (creates the directory if needed)
+    :param directory: the directory of the replays
+    :return: the file name, from the current date and time
+    """
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, time.strftime("%Y-%m-%d_%H-%M-%S") + ".cwr")
+
+
+def pack_inputs(inputs: Inputs | None) -> int:
+    """
+    Pack Inputs in a byte
+    :param inputs: the Inputs, or None
+    :return: the byte
+    """
+    if inputs is None:
+        return NO_INPUTS
+    return (inputs.move + 1) | (inputs.rotate + 1) << 2 | inputs.jump << 4 | inputs.shoot << 5
+
+
+def unpack_inputs(byte: int) -> Inputs | None:
+    """
+    Unpack Inputs packed with pack_inputs
+    :param byte: the byte
+    :return: the Inputs, or None
+    """
+    if byte == NO_INPUTS:
+        return None
+    inputs = Inputs()
+    inputs.move = (byte & 3) - 1
+    inputs.rotate = (byte >> 2 & 3) - 1
+    inputs.jump = bool(byte & 16)
+    inputs.shoot = bool(byte & 32)
+    return inputs
+
+
+def tank_values(tank: Tank) -> tuple[float, ...]:
+    """
+    Get the values of a Tank that change during a match
+    :param tank: the Tank
+    :return: x, dx, y, dy, r, dr, recoil, drecoil, health, last_shot
+    """
+    return (tank.x, tank.dx, tank.y, tank.dy, tank.r, tank.dr, tank.recoil, tank.drecoil, tank.health,
+            tank.last_shot)
+
+
+def set_tank(tank: Tank, values: tuple[float, ...] | list[float]) -> None:
+    """
+    Set the values of a Tank
+    :param tank: the Tank
+    :param values: x, dx, y, dy, r, dr, recoil, drecoil, health and optionally last_shot
+    :return: None
+    """
+    tank.x, tank.dx, tank.y, tank.dy, tank.r, tank.dr, tank.recoil, tank.drecoil, tank.health = values[:9]
+    if len(values) > 9:
+        tank.last_shot = values[9]
+
+
+class ReplayRecorder:
+    """
+    Records a match while it is played. Records are written as they happen, so the memory used stays small
+    however long the match is (only the keyframe index is kept)
+    """
+
+    def __init__(self, path: str | None, state: GameState, keyframe_interval: int = KEYFRAME_INTERVAL) -> None:
+        """
+        Initiate the ReplayRecorder
+        :param path: the replay file, None to record nothing
+        :param state: the GameState to record
+        :param keyframe_interval: the ticks between keyframes (seeking simulates up to this many ticks)
+        """
+        self.state: GameState = state
+        self.keyframe_interval: int = keyframe_interval
+        self.file = open(path, "wb") if path is not None else None
+        self.tick_count: int = 0
+        self.run: list = [None, 0]  # [packed inputs, tick count] of the ticks not written yet
+        self.index: list[tuple[int, int]] = []
+        if self.file is not None:
+            self.file.write(HEADER.pack(MAGIC, REPLAY_VERSION, TIMESTEP, keyframe_interval))
+
+    def write_run(self) -> None:
+        """
+        Write the ticks that are not written yet
+        :return: None
+        """
+        inputs, count = self.run
+        if count:
+            self.file.write(b"T" + TICKS.pack(count, *inputs))
+            self.run[1] = 0
+
+    def write(self, kind: bytes, data: bytes) -> None:
+        """
+        Write a record
+        :param kind: the record type
+        :param data: the record data
+        :return: None
+        """
+        if self.file is None:
+            return
+        self.write_run()
+        self.file.write(kind + data)
+
+    def write_keyframe(self) -> None:
+        """
+        Write a keyframe of the current GameState, and add it to the index
+        :return: None
+        """
+        self.write_run()
+        state = self.state
+        self.index.append((self.tick_count, self.file.tell()))
+        data = bytearray(KEYFRAME.pack(self.tick_count, state.time, state.next_id, len(state.balls)))
+        data += KEY_TANK.pack(*tank_values(state.p1)) + KEY_TANK.pack(*tank_values(state.p2))
+        for x, y, dx, dy, colour, ball_id in state.balls:
+            data += KEY_BALL.pack(ball_id, x, y, dx, dy, COLOURS.index(colour))
+        self.file.write(b"K" + data)
+        self.file.flush()  # A crash loses at most one keyframe interval
+
+    def tick(self, inputs: tuple[Inputs | None, Inputs | None]) -> None:
+        """
+        Record a tick (call it right before GameState.step, with the same inputs)
+        :param inputs: the Inputs of both players
+        :return: None
+        """
+        if self.file is None:
+            return
+        if self.tick_count % self.keyframe_interval == 0:
+            self.write_keyframe()
+        packed = pack_inputs(inputs[0]), pack_inputs(inputs[1])
+        if packed != self.run[0] or self.run[1] == 0xffff:
+            self.write_run()
+            self.run[0] = packed
+        self.run[1] += 1
+        self.tick_count += 1
+
+    def set_tank(self, player: int, values: tuple[float, ...] | list[float]) -> None:
+        """
+        Set a Tank from the network, and record it
+        :param player: 1 or 2
+        :param values: x, dx, y, dy, r, dr, recoil, drecoil, health
+        :return: None
+        """
+        set_tank(self.state.p1 if player == 1 else self.state.p2, values)
+        self.write(b"S", SET_TANK.pack(player, *values))
+
+    def sync_ball(self, x: float, y: float, dx: float, dy: float, colour: str, ball_id: int) -> None:
+        """
+        Update or spawn a ball from the network (GameState.sync_ball), and record it
+        :param x: ball x
+        :param y: ball y
+        :param dx: ball x velocity
+        :param dy: ball y velocity
+        :param colour: ball colour
+        :param ball_id: ball id
+        :return: None
+        """
+        self.state.sync_ball(x, y, dx, dy, colour, ball_id)
+        self.write(b"B", KEY_BALL.pack(ball_id, x, y, dx, dy, COLOURS.index(colour)))
+
+    def despawn_ball(self, colour: str, ball_id: int) -> None:
+        """
+        Despawn a ball from the network (GameState.despawn_ball), and record it
+        :param colour: ball colour
+        :param ball_id: ball id
+        :return: None
+        """
+        self.state.despawn_ball(colour, ball_id)
+        self.write(b"D", DESPAWN.pack(ball_id, COLOURS.index(colour)))
+
+    def keep_balls(self, colour: str, ball_ids: set[int]) -> None:
+        """
+        Despawn all balls of a colour except some (GameState.keep_balls), and record it
+        :param colour: ball colour
+        :param ball_ids: the ids of the balls to keep
+        :return: None
+        """
+        self.state.keep_balls(colour, ball_ids)
+        self.write(b"P", KEEP.pack(COLOURS.index(colour), len(ball_ids)) +
+                   b"".join(KEEP_ID.pack(ball_id) for ball_id in ball_ids))
+
+    def close(self) -> None:
+        """
+        Write the keyframe index and close the file
+        :return: None
+        """
+        if self.file is None or self.file.closed:
+            return
+        self.write_run()
+        offset = self.file.tell()
+        for entry in self.index:
+            self.file.write(INDEX_ENTRY.pack(*entry))
+        self.file.write(FOOTER.pack(offset, len(self.index), INDEX_MAGIC))
+        self.file.close()
+
+
+class Replay:
+    """
+    Plays a replay file back
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Open a replay
+        :param path: the replay file
+        """
+        self.file = open(path, "rb")
+        self.data: mmap.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)  # Not read all at once
+        magic, version, self.timestep, self.keyframe_interval = HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a replay")
+        if version != REPLAY_VERSION:
+            raise ValueError(f"Unsupported replay version {version} (expected {REPLAY_VERSION})")
+        self.index: list[tuple[int, int]] = []
+        self.end: int = len(self.data)
+        self.ticks: int = 0
+        self.read_index()
+        self.state: GameState = GameState()
+        self.tick_count: int = 0
+        self.offset: int = HEADER.size
+        self.remaining: int = 0  # ticks left in the current run
+        self.inputs: tuple[int, int] = (NO_INPUTS, NO_INPUTS)  # packed, for the current run
+        self.load(0)
+
+    def read_index(self) -> None:
+        """
+        Read the keyframe index, or rebuild it if the recording wasn't closed
+        :return: None
+        """
+        if len(self.data) >= HEADER.size + FOOTER.size:
+            offset, count, magic = FOOTER.unpack_from(self.data, len(self.data) - FOOTER.size)
+            if magic == INDEX_MAGIC and offset + count * INDEX_ENTRY.size + FOOTER.size == len(self.data):
+                self.index = [INDEX_ENTRY.unpack_from(self.data, offset + i * INDEX_ENTRY.size)
+                              for i in range(count)]
+                self.end = offset
+        offset = self.index[-1][1] if self.index else HEADER.size
+        ticks = self.index[-1][0] if self.index else 0
+        indexed = bool(self.index)
+        while offset < self.end:  # Count the ticks after the last keyframe (and find the keyframes if unindexed)
+            size = self.record_size(offset)
+            if offset + size > self.end:  # Cut off while recording
+                self.end = offset
+                break
+            kind = self.data[offset:offset + 1]
+            if kind == b"K" and not indexed:
+                self.index.append((ticks, offset))
+            elif kind == b"T":
+                ticks += TICKS.unpack_from(self.data, offset + 1)[0]
+            offset += size
+        self.ticks = ticks
+
+    def record_size(self, offset: int) -> int:
+        """
+        Get the size of a record
+        :param offset: where the record starts
+        :return: the record size, with its type
+        """
+        kind = self.data[offset:offset + 1]
+        if offset + 1 >= self.end:
+            return 1 << 62
+        if kind == b"T":
+            return 1 + TICKS.size
+        if kind == b"K":
+            count = KEYFRAME.unpack_from(self.data, offset + 1)[3] if offset + 1 + KEYFRAME.size <= self.end else 0
+            return 1 + KEYFRAME.size + 2 * KEY_TANK.size + count * KEY_BALL.size
+        if kind == b"S":
+            return 1 + SET_TANK.size
+        if kind == b"B":
+            return 1 + KEY_BALL.size
+        if kind == b"D":
+            return 1 + DESPAWN.size
+        if kind == b"P":
+            count = KEEP.unpack_from(self.data, offset + 1)[1] if offset + 1 + KEEP.size <= self.end else 0
+            return 1 + KEEP.size + count * KEEP_ID.size
+        raise ValueError(f"Unknown replay record {kind!r} at {offset}")
+
+    def load_keyframe(self, offset: int) -> None:
+        """
+        Set Replay.state to a keyframe
+        :param offset: where the keyframe record starts
+        :return: None
+        """
+        offset += 1
+        tick, tm, next_id, count = KEYFRAME.unpack_from(self.data, offset)
+        offset += KEYFRAME.size
+        state = GameState()
+        state.time = tm
+        state.next_id = next_id
+        for tank in (state.p1, state.p2):
+            set_tank(tank, KEY_TANK.unpack_from(self.data, offset))
+            offset += KEY_TANK.size
+        for ball_id, x, y, dx, dy, colour in KEY_BALL.iter_unpack(self.data[offset:offset + count * KEY_BALL.size]):
+            state.balls.add(x, y, dx, dy, COLOURS[colour], ball_id)
+        self.state = state
+        self.tick_count = tick
+        self.remaining = 0
+
+    def load(self, tick: int) -> None:
+        """
+        Go to the last keyframe before a tick
+        :param tick: the tick
+        :return: None
+        """
+        keyframes = [entry for entry in self.index if entry[0] <= tick]
+        if keyframes:
+            self.load_keyframe(keyframes[-1][1])
+            self.offset = keyframes[-1][1] + self.record_size(keyframes[-1][1])
+        else:
+            self.state = GameState()
+            self.tick_count = 0
+            self.remaining = 0
+            self.offset = HEADER.size
+        self.read_records()
+
+    def seek(self, tick: int) -> GameState:
+        """
+        Go to a tick, simulating at most one keyframe interval
+        :param tick: the tick (clamped to the replay length)
+        :return: the GameState at the tick
+        """
+        tick = max(0, min(self.ticks, tick))
+        if not self.tick_count <= tick < self.tick_count + self.keyframe_interval:
+            self.load(tick)
+        while self.tick_count < tick and self.step():
+            pass
+        return self.state
+
+    def read_records(self) -> bool:
+        """
+        Apply the records up to the next tick
+        :return: False if the replay ended, True otherwise
+        """
+        while not self.remaining:
+            if self.offset >= self.end:
+                return False
+            kind = self.data[self.offset:self.offset + 1]
+            data = self.offset + 1
+            if kind == b"T":
+                self.remaining, p1, p2 = TICKS.unpack_from(self.data, data)
+                self.inputs = p1, p2
+            elif kind == b"S":
+                player, *values = SET_TANK.unpack_from(self.data, data)
+                set_tank(self.state.p1 if player == 1 else self.state.p2, values)
+            elif kind == b"B":
+                ball_id, x, y, dx, dy, colour = KEY_BALL.unpack_from(self.data, data)
+                self.state.sync_ball(x, y, dx, dy, COLOURS[colour], ball_id)
+            elif kind == b"D":
+                ball_id, colour = DESPAWN.unpack_from(self.data, data)
+                self.state.despawn_ball(COLOURS[colour], ball_id)
+            elif kind == b"P":
+                colour, count = KEEP.unpack_from(self.data, data)
+                ids = self.data[data + KEEP.size:data + KEEP.size + count * KEEP_ID.size]
+                self.state.keep_balls(COLOURS[colour], {ball_id for ball_id, in KEEP_ID.iter_unpack(ids)})
+            self.offset += self.record_size(self.offset)  # Keyframes are skipped: the state is already there
+        return True
+
+    def step(self) -> bool:
+        """
+        Simulate the next tick, then apply the changes from the network that came before the one after it
+        (like a keyframe, which is written right before its tick)
+        :return: False if the replay ended, True otherwise
+        """
+        if not self.read_records():
+            return False
+        self.state.step(self.timestep, (unpack_inputs(self.inputs[0]), unpack_inputs(self.inputs[1])))
+        self.remaining -= 1
+        self.tick_count += 1
+        self.read_records()
+        return True
+
+    def close(self) -> None:
+        self.data.close()
+        self.file.close()
+
+
+def view(path: str) -> None:
+    """
+    Watch a replay: space pauses, left and right seek 5 seconds, home restarts, the slider seeks anywhere
+    :param path: the replay file
+    """
+    from tkinter import Tk, Canvas, Scale, HORIZONTAL
+    from view import GameView
+
+    replay = Replay(path)
+    root = Tk()
+    root.title(f"Replay - {path}")
+    canv = Canvas(root, width=640, height=640, bg="white")
+    canv.pack()
+    game_view = GameView(canv)
+    ticks_per_second = round(1 / replay.timestep)
+    slider = Scale(root, from_=0, to=replay.ticks / ticks_per_second, resolution=1 / ticks_per_second,
+                   orient=HORIZONTAL, length=620, label="seconds")
+    slider.pack()
+    clock = {"paused": False, "last": time.perf_counter(), "accumulator": 0.}
+
+    def seek(tick: int) -> None:
+        replay.seek(tick)
+        slider.set(replay.tick_count / ticks_per_second)
+
+    def onpress(e) -> None:
+        key = e.keysym.lower()
+        if key == "space":
+            clock["paused"] = not clock["paused"]
+        elif key == "left":
+            seek(replay.tick_count - 5 * ticks_per_second)
+        elif key == "right":
+            seek(replay.tick_count + 5 * ticks_per_second)
+        elif key == "home":
+            seek(0)
+
+    def onslide(e) -> None:
+        seek(round(slider.get() * ticks_per_second))
+
+    def update() -> None:
+        now = time.perf_counter()
+        if not clock["paused"]:
+            clock["accumulator"] += min(now - clock["last"], 0.25)
+            while clock["accumulator"] >= replay.timestep:
+                replay.step()
+                clock["accumulator"] -= replay.timestep
+            slider.set(replay.tick_count / ticks_per_second)
+        clock["last"] = now
+        game_view.draw(replay.state)
+        root.after(1, update)
+
+    root.bind("<KeyPress>", onpress)
+    slider.bind("<ButtonRelease-1>", onslide)
+    update()
+    root.mainloop()
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) != 2:
+        print("Usage: python replay.py <file>")
+    else:
+        view(sys.argv[1])
@@ -0,0 +1,262 @@
+﻿"""
+A headless match server: answers the search of any room, pairs the two players of every room and relays their
+messages, so one process can host many matches at once (like a LAN tournament)
+"""
+import argparse
+import asyncio
+import time
+import network
+
+
+class Match:
+    """
+    A room with two players. Their messages are relayed once per tick
+    """
+
+    def __init__(self, room: str) -> None:
+        """
+        Initiate the Match
+        :param room: the room code
+        """
+        self.room: str = room
+        self.players: list[network.AsyncConnection] = []
+        self.started: asyncio.Event = asyncio.Event()
+        self.finished: bool = False
+        self.queues: tuple[list[bytes], list[bytes]] = ([], [])  # TCP messages to send to each player
+        self.datagrams: list[bytes | None] = [None, None]  # the newest datagram to send to each player
+        self.udp_addrs: list[tuple[str, int] | None] = [None, None]
+        self.ticks: int = 0
+        self.tick_time: float = 0
+        self.max_tick_time: float = 0
+        self.messages: int = 0
+
+    def other(self, player: int) -> network.AsyncConnection | None:
+        """
+        Get the other player of the Match
+        :param player: the player's index
+        :return: the other player's connection, None if the other player isn't there yet
+        """
+        return self.players[1 - player] if len(self.players) == 2 else None
+
+    def report(self, interval: float) -> str:
+        """
+        Get the tick stats since the last report, and reset them
+        :param interval: the time since the last report
+        :return: the stats
+        """
+        avg = self.tick_time / self.ticks * 1000 if self.ticks else 0
+        text = (f"[SERVER] Room \"{self.room}\": {self.ticks / interval:.0f} ticks/s, tick avg {avg:.3f} ms, "
+                f"max {self.max_tick_time * 1000:.3f} ms, {self.messages / interval:.0f} messages/s")
+        self.ticks = 0
+        self.tick_time = 0
+        self.max_tick_time = 0
+        self.messages = 0
+        return text
+
+
+class RelayProtocol(asyncio.DatagramProtocol):
+    """
+    Receives the players' datagrams (see Network.open_channel) and keeps the newest one of each for their Match
+    """
+
+    def __init__(self) -> None:
+        """
+        Initiate the RelayProtocol
+        """
+        self.transport: asyncio.DatagramTransport | None = None
+        self.senders: dict[tuple[str, int], tuple[Match, int]] = {}
+
+    def connection_made(self, transport: asyncio.DatagramTransport) -> None:
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr: tuple[str, int]) -> None:
+        sender = self.senders.get(addr)
+        if sender is None:
+            return
+        match, player = sender
+        match.datagrams[1 - player] = data  # Older ones would be dropped by the DatagramChannel anyway
+        match.messages += 1
+
+
+class MatchServer:
+    """
+    Serves the matches of every room in one event loop
+    """
+
+    def __init__(self, port: int = network.BROADCAST_PORT, udp_port: int = network.PORT + 2,
+                 broadcast_port: int = network.BROADCAST_PORT, tick_rate: float = 120, report_interval: float = 5,
+                 max_buffer: int = 1 << 20, log: bool = network.LOG) -> None:
+        """
+        Initiate the MatchServer
+        :param port: the TCP port (Network clients connect to the port they search on)
+        :param udp_port: the UDP port the datagrams are relayed through
+        :param broadcast_port: the port to answer room searches on
+        :param tick_rate: how many times per second the messages of every Match are relayed
+        :param report_interval: how often the tick stats of every Match are printed (in seconds), 0 to never print
+        :param max_buffer: the most bytes waiting to be sent to a player, a slower player is disconnected
+        :param log: whether to print connections and stats
+        """
+        self.net: network.AsyncNetwork = network.AsyncNetwork(port, broadcast_port, log=log)
+        self.udp_port: int = udp_port
+        self.tick_rate: float = tick_rate
+        self.report_interval: float = report_interval
+        self.max_buffer: int = max_buffer
+        self.log: bool = log
+        self.waiting: dict[str, Match] = {}  # room -> Match with one player
+        self.matches: set[Match] = set()
+        self.relay: RelayProtocol = RelayProtocol()
+
+    @staticmethod
+    def reply(data: bytes) -> bytes | None:
+        """
+        Answer the search of any room
+        :param data: the received message
+        :return: the reply, None if the message isn't a room search
+        """
+        if data.startswith(network.ROOM_MSG):
+            return network.ROOM_REPLY + data[len(network.ROOM_MSG):]
+        return None
+
+    async def handle(self, conn: network.AsyncConnection) -> None:
+        """
+        Put a connection in its room's Match, then queue its messages for the other player
+        :param conn: the connection
+        :return: None
+        """
+        room = await conn.recv_str()
+        match = self.waiting.pop(room, None)
+        if match is None:
+            match = self.waiting[room] = Match(room)
+        player = len(match.players)
+        match.players.append(conn)
+        if len(match.players) == 2:
+            self.matches.add(match)
+            asyncio.create_task(self.run(match))
+            match.started.set()
+        try:
+            await self.wait_start(match, conn)
+            await conn.send_str(room)
+            port = network.CHANNEL_HELLO.unpack(await conn.recv())[0]
+            match.udp_addrs[player] = (conn.addr[0], port)
+            self.relay.senders[match.udp_addrs[player]] = (match, player)
+            await conn.send(network.CHANNEL_HELLO.pack(self.udp_port))
+            while True:
+                match.queues[1 - player].append(await conn.recv())
+                match.messages += 1
+        finally:
+            if self.waiting.get(room) is match:
+                del self.waiting[room]
+            match.finished = True
+            other = match.other(player)
+            if other is not None:
+                other.close()
+            self.relay.senders.pop(match.udp_addrs[player], None)
+
+    @staticmethod
+    async def wait_start(match: Match, conn: network.AsyncConnection) -> None:
+        """
+        Wait for the other player of a Match (the client sends nothing until then)
+        :param match: the Match
+        :param conn: the connection of the waiting player
+        :return: None
+        """
+        started = asyncio.create_task(match.started.wait())
+        closed = asyncio.create_task(conn.reader.read(1))  # Returns (b"") when the connection closes
+        try:
+            done, _ = await asyncio.wait((started, closed), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            started.cancel()
+            closed.cancel()
+            await asyncio.wait((started, closed))  # The reader can only be used again once the read is cancelled
+        if started not in done:
+            raise ConnectionError("Disconnected while waiting for the other player") from closed.exception()
+
+    async def run(self, match: Match) -> None:
+        """
+        Relay the messages of a Match every tick until it is finished
+        :param match: the Match
+        :return: None
+        """
+        if self.log:
+            print(f"[SERVER] Room \"{match.room}\" started")
+        interval = 1 / self.tick_rate
+        next_tick = time.perf_counter()
+        while not match.finished:
+            start = time.perf_counter()
+            for player, conn in enumerate(match.players):
+                queue = match.queues[player]
+                if queue:
+                    conn.writer.write(b"".join(network.FRAME_HEADER.pack(len(data)) + data for data in queue))
+                    queue.clear()
+                    if conn.writer.transport.get_write_buffer_size() > self.max_buffer:  # Not draining, too slow
+                        if self.log:
+                            print(f"[SERVER] {conn.addr[0]}:{conn.addr[1]} is too slow, closing room \"{match.room}\"")
+                        match.finished = True
+                        conn.close()
+                datagram = match.datagrams[player]
+                if datagram is not None and match.udp_addrs[player] is not None:
+                    self.relay.transport.sendto(datagram, match.udp_addrs[player])
+                    match.datagrams[player] = None
+            tick_time = time.perf_counter() - start
+            match.ticks += 1
+            match.tick_time += tick_time
+            match.max_tick_time = max(match.max_tick_time, tick_time)
+            next_tick = max(next_tick + interval, time.perf_counter())  # After a stall, don't catch up in a burst
+            await asyncio.sleep(next_tick - time.perf_counter())
+        self.matches.discard(match)
+        if self.log:
+            print(f"[SERVER] Room \"{match.room}\" finished")
+
+    async def report(self) -> None:
+        """
+        Print the tick stats of every Match forever
+        :return: None
+        """
+        while True:
+            await asyncio.sleep(self.report_interval)
+            for match in list(self.matches):
+                print(match.report(self.report_interval))
+
+    async def start(self) -> None:
+        """
+        Start serving (returns once the server is listening)
+        :return: None
+        """
+        loop = asyncio.get_running_loop()
+        await loop.create_datagram_endpoint(lambda: self.relay, local_addr=("0.0.0.0", self.udp_port))
+        await self.net.listen_for_broadcast(self.reply)
+        await self.net.serve(self.handle)
+        if self.log and self.report_interval:
+            asyncio.create_task(self.report())
+
+    def close(self) -> None:
+        self.net.close()
+        if self.relay.transport is not None:
+            self.relay.transport.close()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Host the matches of any number of rooms")
+    parser.add_argument("--port", type=int, default=network.BROADCAST_PORT, help="the TCP port")
+    parser.add_argument("--udp-port", type=int, default=network.PORT + 2, help="the UDP relay port")
+    parser.add_argument("--broadcast-port", type=int, default=network.BROADCAST_PORT,
+                        help="the port to answer room searches on")
+    parser.add_argument("--tick-rate", type=float, default=120, help="relay ticks per second")
+    parser.add_argument("--report-interval", type=float, default=5, help="seconds between tick stats, 0 for none")
+    parser.add_argument("--max-buffer", type=int, default=1 << 20,
+                        help="the most bytes waiting to be sent to a player before they are disconnected")
+    args = parser.parse_args()
+    match_server = MatchServer(args.port, args.udp_port, args.broadcast_port, args.tick_rate, args.report_interval,
+                               args.max_buffer)
+    await match_server.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        match_server.close()
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
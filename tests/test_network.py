@@ -0,0 +1,65 @@
+﻿"""
+Round trips of the game states and events sent by main.py
+"""
+import pytest
+from network import (COLOURS, EVENTS_HEADER, SNAPSHOT_BALLS, STATE_BALL, STATE_HEADER, STATE_VERSION, decode_events,
+                     decode_state, encode_events, encode_state, snapshot_parts)
+
+TANK = [150.5, -3.25, 400.0, 12.5, 25.0, 0.0, 1.5, -0.75, 80.0]  # All exact in float32
+BALLS = [[10.5, 20.25, 300.0, -150.0, "red", 1], [0.0, 0.0, -0.5, 0.5, "green", 2 ** 32 - 1]]
+
+
+@pytest.mark.parametrize("balls", [[], BALLS])
+def test_state_round_trip(balls):
+    data = encode_state(12.345, TANK, balls, (3, 0, 2 ** 32 - 1), 6.789)
+    assert len(data) == STATE_HEADER.size + STATE_BALL.size * len(balls)
+    assert decode_state(data) == (12.345, TANK, balls, (3, 0, 2 ** 32 - 1), 6.789)
+
+
+def test_state_defaults():
+    assert decode_state(encode_state(1.0, TANK)) == (1.0, TANK, [], None, 0)
+
+
+def test_snapshot_parts():
+    balls = [[0.0, 0.0, 0.0, 0.0, "red", ball_id] for ball_id in range(SNAPSHOT_BALLS * 2, 0, -1)]
+    parts = snapshot_parts(balls, 1000, 7)
+    assert [len(part) for part, _ in parts] == [SNAPSHOT_BALLS, SNAPSHOT_BALLS]
+    assert [snapshot for _, snapshot in parts] == [(7, 0, SNAPSHOT_BALLS + 1), (7, SNAPSHOT_BALLS + 1, 1000)]
+    for part, (_, first_id, end_id) in parts:
+        assert all(first_id <= ball[5] < end_id for ball in part)
+    assert snapshot_parts([], 5, 0) == [([], (0, 0, 5))]
+
+
+def test_state_colour_byte():
+    data = encode_state(0, TANK, BALLS)
+    for i, ball in enumerate(BALLS):
+        assert data[STATE_HEADER.size + STATE_BALL.size * (i + 1) - 1] == COLOURS.index(ball[4])
+
+
+@pytest.mark.parametrize("encode, decode", [(lambda: encode_state(0, TANK, BALLS), decode_state),
+                                            (lambda: encode_events(BALLS, [3, 4]), decode_events)])
+def test_unknown_version(encode, decode):
+    data = encode()
+    with pytest.raises(ValueError, match="version"):
+        decode(bytes([STATE_VERSION + 1]) + data[1:])
+
+
+@pytest.mark.parametrize("encode, decode", [(lambda: encode_state(0, TANK, BALLS), decode_state),
+                                            (lambda: encode_events(BALLS, [3, 4]), decode_events)])
+@pytest.mark.parametrize("cut", [1, STATE_BALL.size])
+def test_truncated(encode, decode, cut):
+    with pytest.raises(ValueError, match="too short"):
+        decode(encode()[:-cut])
+
+
+@pytest.mark.parametrize("decode", [decode_state, decode_events])
+def test_truncated_header(decode):
+    with pytest.raises(ValueError, match="too short"):
+        decode(bytes([STATE_VERSION]))
+
+
+@pytest.mark.parametrize("spawned, despawned", [([], []), (BALLS, []), ([], [5, 2 ** 32 - 1]), (BALLS, [3, 4])])
+def test_events_round_trip(spawned, despawned):
+    data = encode_events(spawned, despawned, 12)
+    assert len(data) == EVENTS_HEADER.size + STATE_BALL.size * len(spawned) + 4 * len(despawned)
+    assert decode_events(data) == (spawned, despawned, 12)
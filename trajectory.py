@@ -0,0 +1,250 @@
+﻿"""
+Where the balls go, in closed form: with linear air drag (like GameState.step), the position at any time has an
+exact formula, so a shot can be predicted (or aimed) without simulating it step by step
+"""
+import math
+import numpy as np
+from game import (AIR_FRICTION, BALL_SPEED, GRAVITY, GROUND_Y, PLATFORM_HEIGHT, TIMESTEP, WHEEL_DIAMETER,
+                  WHEEL_SPACE, WIDTH, Tank)
+
+MIN_ANGLE = 1  # The cannon rotation limits of GameState.step
+MAX_ANGLE = 89
+
+
+def decay(t: float | np.ndarray, drag: float = AIR_FRICTION,
+          timestep: float = TIMESTEP) -> tuple[float | np.ndarray, float]:
+    """
+    Get how much of its velocity a ball keeps after some time (without gravity)
+    :param t: the time
+    :param drag: the air friction
+    :param timestep: the time of one GameState.step (with its Euler steps, the formulas are exact after every step),
+    0 for continuous time
+    :return: (the kept fraction, the factor of the distance formulas: the kept fraction after one step)
+    """
+    if timestep:
+        kept = 1 - drag * timestep
+        return kept ** (t / timestep), kept
+    return np.exp(-drag * t), 1
+
+
+def position(t: float | np.ndarray, x: float, y: float, dx: float, dy: float, gravity: float = GRAVITY,
+             drag: float = AIR_FRICTION, timestep: float = TIMESTEP) -> tuple:
+    """
+    Get the position of a ball after some time (in the air, the floor isn't taken into account)
+    :param t: the time since (x, y)
+    :param x: ball x
+    :param y: ball y
+    :param dx: ball x velocity
+    :param dy: ball y velocity
+    :param gravity: the gravity
+    :param drag: the air friction
+    :param timestep: the time of one GameState.step, 0 for continuous time (see decay)
+    :return: (x, y) after t
+    """
+    if not drag:
+        # Without drag the velocity grows linearly, the Euler steps add half a step of gravity
+        return x + dx * t, y + dy * t + gravity * t * (t + timestep) / 2
+    kept, factor = decay(t, drag, timestep)
+    terminal = gravity * factor / drag  # The y velocity it tends to
+    return (x + dx * factor / drag * (1 - kept),
+            y + terminal * t + (dy - terminal) * factor / drag * (1 - kept))
+
+
+def velocity(t: float | np.ndarray, dx: float, dy: float, gravity: float = GRAVITY, drag: float = AIR_FRICTION,
+             timestep: float = TIMESTEP) -> tuple:
+    """
+    Get the velocity of a ball after some time
+    :param t: the time
+    :param dx: ball x velocity
+    :param dy: ball y velocity
+    :param gravity: the gravity
+    :param drag: the air friction
+    :param timestep: the time of one GameState.step, 0 for continuous time (see decay)
+    :return: (x velocity, y velocity) after t
+    """
+    if not drag:
+        return dx, dy + gravity * t
+    kept, factor = decay(t, drag, timestep)
+    terminal = gravity * factor / drag
+    return dx * kept, terminal + (dy - terminal) * kept
+
+
+def time_to(x: float | np.ndarray, x0: float | np.ndarray, dx: float | np.ndarray, drag: float = AIR_FRICTION,
+            timestep: float = TIMESTEP) -> float | np.ndarray:
+    """
+    Find when a ball gets to some x (the drag limits how far it can go)
+    :param x: the x to get to
+    :param x0: ball x
+    :param dx: ball x velocity
+    :param drag: the air friction
+    :param timestep: the time of one GameState.step, 0 for continuous time (see decay)
+    :return: the time, nan if it never gets there
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if not drag:
+            t = np.divide(x - x0, dx)
+            return np.where(t >= 0, t, np.nan)
+        factor = 1 - drag * timestep if timestep else 1
+        kept = 1 - (x - x0) * drag / (dx * factor)  # From the x formula of position
+        kept = np.where((kept > 0) & (kept <= 1), kept, np.nan)
+        if timestep:
+            return timestep * np.log(kept) / math.log(factor)
+        return -np.log(kept) / drag
+
+
+def muzzle(r: float | np.ndarray) -> tuple:
+    """
+    Get where a Tank's ball starts, like GameState.shoot, in the Tank's frame (forward is where it faces)
+    :param r: the cannon rotation in degrees
+    :return: (forward distance, y, forward velocity, y velocity) relative to the Tank
+    """
+    rad = np.radians(r)
+    cos, sin = np.cos(rad), np.sin(rad)
+    return (-(WHEEL_SPACE / 2 + WHEEL_DIAMETER / 2) + (WHEEL_SPACE + WHEEL_DIAMETER) * cos,
+            -PLATFORM_HEIGHT / 2 - (WHEEL_SPACE + WHEEL_DIAMETER) * sin, BALL_SPEED * cos, -BALL_SPEED * sin)
+
+
+def height_at(distance: float | np.ndarray, r: float | np.ndarray, gravity: float = GRAVITY,
+              drag: float = AIR_FRICTION, timestep: float = TIMESTEP) -> float | np.ndarray:
+    """
+    Get the y of a Tank's ball when it is some distance in front of the Tank
+    :param distance: the distance in front of the Tank
+    :param r: the cannon rotation in degrees
+    :param gravity: the gravity
+    :param drag: the air friction
+    :param timestep: the time of one GameState.step, 0 for continuous time (see decay)
+    :return: the y relative to the Tank, nan if the ball doesn't get that far
+    """
+    x0, y0, dx, dy = muzzle(r)
+    t = time_to(distance, x0, dx, drag, timestep)
+    return position(t, x0, y0, dx, dy, gravity, drag, timestep)[1]
+
+
+def solve_angle(distance: float | np.ndarray, height: float | np.ndarray, high: bool = False,
+                gravity: float = GRAVITY, drag: float = AIR_FRICTION, timestep: float = TIMESTEP,
+                iterations: int = 40) -> float | np.ndarray:
+    """
+    Find the cannon rotation that sends a ball through a point: every degree between MIN_ANGLE and MAX_ANGLE is
+    tried, then the angle is bisected between the two around the point (works on arrays of points at once)
+    :param distance: the distance of the point in front of the Tank
+    :param height: the y of the point relative to the Tank
+    :param high: if True, finds the highest trajectory (a lob), otherwise the flattest one (the fastest)
+    :param gravity: the gravity
+    :param drag: the air friction
+    :param timestep: the time of one GameState.step, 0 for continuous time (see decay)
+    :param iterations: the number of bisections (each one halves the error)
+    :return: the rotation in degrees, nan if the point can't be reached
+    """
+    distance, height = np.broadcast_arrays(np.asarray(distance, float), np.asarray(height, float))
+    angles = np.arange(MIN_ANGLE, MAX_ANGLE + 1, dtype=float)
+    errors = height_at(distance[..., None], angles, gravity, drag, timestep) - height[..., None]
+    crossing = errors[..., :-1] * errors[..., 1:] <= 0  # nan compares False
+    found = crossing.any(axis=-1)
+    if high:
+        first = crossing.shape[-1] - 1 - np.argmax(crossing[..., ::-1], axis=-1)
+    else:
+        first = np.argmax(crossing, axis=-1)
+    low = angles[first]
+    high_angle = low + 1
+    low_error = np.take_along_axis(errors, first[..., None], axis=-1)[..., 0]
+    for _ in range(iterations):
+        mid = (low + high_angle) / 2
+        mid_error = height_at(distance, mid, gravity, drag, timestep) - height
+        same = (mid_error * low_error > 0)
+        low = np.where(same, mid, low)
+        low_error = np.where(same, mid_error, low_error)
+        high_angle = np.where(same, high_angle, mid)
+    angle = np.where(found, (low + high_angle) / 2, np.nan)
+    return float(angle) if angle.ndim == 0 else angle
+
+
+def target(shooter: Tank, other: Tank) -> tuple[float, float]:
+    """
+    Get the point a Tank aims at to hit another one: the middle of its hit box (see Tank.hit)
+    :param shooter: the Tank that shoots
+    :param other: the Tank to hit
+    :return: (the distance in front of the shooter, the y relative to the shooter)
+    """
+    return shooter.facing * (other.x - shooter.x), other.y + WHEEL_DIAMETER / 2 - shooter.y
+
+
+def aim(shooter: Tank, other: Tank, high: bool = False) -> float | None:
+    """
+    Find the cannon rotation a Tank needs to hit another one (if neither moves)
+    :param shooter: the Tank that shoots
+    :param other: the Tank to hit
+    :param high: if True, finds the highest trajectory, otherwise the flattest one
+    :return: the rotation in degrees, None if the other Tank can't be reached
+    """
+    angle = solve_angle(*target(shooter, other), high)
+    return None if math.isnan(angle) else angle
+
+
+class AimTable:
+    """
+    The angles of solve_angle, precomputed on a grid of (distance, height) and bilinearly interpolated,
+    so aiming costs the same whatever the distance (works on arrays of points at once, like the Tanks of a BatchState).
+    The few cells that can't be interpolated (at the edge of the range, where the angle jumps from one trajectory
+    to another, or where the interpolation misses the middle of the cell by more than max_error) are solved with
+    solve_angle
+    """
+
+    def __init__(self, max_distance: float = WIDTH, min_height: float = -GROUND_Y, max_height: float = GROUND_Y,
+                 step: float = 5, high: bool = False, max_spread: float = 5,
+                 max_error: float = 0.1) -> None:
+        """
+        Initiate the AimTable (solves every point of the grid)
+        :param max_distance: the farthest distance in front of the Tank
+        :param min_height: the highest relative y (negative is above the Tank)
+        :param max_height: the lowest relative y
+        :param step: the grid spacing
+        :param high: if True, uses the highest trajectories, otherwise the flattest ones
+        :param max_spread: the biggest difference (in degrees) between the corners of a cell that is interpolated
+        :param max_error: the biggest error (in degrees) in the middle of a cell that is interpolated
+        """
+        self.step: float = step
+        self.high: bool = high
+        self.distances: np.ndarray = np.arange(0, max_distance + step, step)
+        self.heights: np.ndarray = np.arange(min_height, max_height + step, step)
+        self.angles: np.ndarray = solve_angle(self.distances[:, None], self.heights[None, :], high)
+        corners = np.stack((self.angles[:-1, :-1], self.angles[:-1, 1:], self.angles[1:, :-1], self.angles[1:, 1:]))
+        middle = solve_angle(self.distances[:-1, None] + step / 2, self.heights[None, :-1] + step / 2, high)
+        with np.errstate(invalid="ignore"):
+            spread = corners.max(axis=0) - corners.min(axis=0)  # nan if a corner can't be reached
+            error = np.abs(corners.mean(axis=0) - middle)  # The bilinear interpolation in the middle is the mean
+        self.unreachable: np.ndarray = np.isnan(corners).all(axis=0)  # True for the cells out of range
+        self.smooth: np.ndarray = (spread <= max_spread) & (error <= max_error)  # True for the cells to interpolate
+
+    def lookup(self, distance: float | np.ndarray, height: float | np.ndarray) -> float | np.ndarray:
+        """
+        Get the angle to send a ball through a point
+        :param distance: the distance of the point in front of the Tank
+        :param height: the y of the point relative to the Tank
+        :return: the rotation in degrees, nan if it is out of the table or can't be reached
+        """
+        i = (np.asarray(distance, float) - self.distances[0]) / self.step
+        j = (np.asarray(height, float) - self.heights[0]) / self.step
+        inside = (i >= 0) & (i <= len(self.distances) - 1) & (j >= 0) & (j <= len(self.heights) - 1)
+        i0 = np.clip(np.floor(np.where(inside, i, 0)).astype(int), 0, len(self.distances) - 2)
+        j0 = np.clip(np.floor(np.where(inside, j, 0)).astype(int), 0, len(self.heights) - 2)
+        fi, fj = i - i0, j - j0
+        angles = self.angles
+        angle = ((angles[i0, j0] * (1 - fj) + angles[i0, j0 + 1] * fj) * (1 - fi) +
+                 (angles[i0 + 1, j0] * (1 - fj) + angles[i0 + 1, j0 + 1] * fj) * fi)
+        angle = np.where(inside & ~self.unreachable[i0, j0], angle, np.nan)
+        solve = inside & ~self.smooth[i0, j0] & ~self.unreachable[i0, j0]
+        if solve.any():
+            distance, height = np.broadcast_arrays(np.asarray(distance, float), np.asarray(height, float))
+            angle = np.array(angle)
+            angle[solve] = solve_angle(distance[solve], height[solve], self.high)
+        return float(angle) if angle.ndim == 0 else angle
+
+    def aim(self, shooter: Tank, other: Tank) -> float | None:
+        """
+        Find the cannon rotation a Tank needs to hit another one (if neither moves), like trajectory.aim
+        :param shooter: the Tank that shoots
+        :param other: the Tank to hit
+        :return: the rotation in degrees, None if the other Tank can't be reached
+        """
+        angle = self.lookup(*target(shooter, other))
+        return None if math.isnan(angle) else angle
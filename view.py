@@ -0,0 +1,117 @@
+﻿from tkinter import Canvas
+from renderer import Renderer
+from game import *
+import math
+
+
+def get_rect_rot(x: float, y: float, width: float, height: float, r: float) -> list[tuple[float, float]]:
+    """
+    Get the points of a rotated rectangle
+    :param x:
+    :param y:
+    :param width:
+    :param height:
+    :param r:
+    :return:
+    """
+    rad = math.radians(-r)
+    p1 = rotate_point(-width / 2, -height / 2, rad)
+    p2 = rotate_point(width / 2, -height / 2, rad)
+    p3 = rotate_point(width / 2, height / 2, rad)
+    p4 = rotate_point(-width / 2, height / 2, rad)
+    return [(x + p1[0], y + p1[1]),
+            (x + p2[0], y + p2[1]),
+            (x + p3[0], y + p3[1]),
+            (x + p4[0], y + p4[1])]
+
+
+def plot_health(state: GameState, max_points: int = 1000) -> None:
+    """
+    Plot both Tanks' health during the match (matplotlib is only imported here, so the game starts faster)
+    :param state: the GameState of the match
+    :param max_points: the log is downsampled to about this many points
+    :return: None
+    """
+    import matplotlib.pyplot as plt
+
+    log = state.health_log + [(state.time, state.p1.health, state.p2.health)]
+    log = log[::max(1, len(log) // max_points)] + log[-1:]
+    times = [entry[0] for entry in log]
+    plt.step(times, [entry[1] for entry in log], where="post", color=state.p1.colour)
+    plt.step(times, [entry[2] for entry in log], where="post", color=state.p2.colour)
+    plt.xlabel("time (s)")
+    plt.ylabel("health")
+    plt.show()
+
+
+class GameView:
+    """
+    Draws a GameState on a tkinter.Canvas
+    """
+
+    def __init__(self, canv: Canvas) -> None:
+        """
+        Initiate the GameView
+        :param canv: the tkinter.Canvas to draw on
+        """
+        self.canv: Canvas = canv
+        self.renderer: Renderer = Renderer(canv)
+        self.drawn_balls: int = 0
+
+    def draw(self, state: GameState, p2: Tank | None = None) -> None:
+        """
+        Draw the floor, the balls, both Tanks and the health bars
+        :param state: the GameState to draw
+        :param p2: the Tank to draw instead of state.p2 (like an interpolated one), None to draw state.p2
+        :return: None
+        """
+        renderer = self.renderer
+        renderer.rectangle("floor", 0, FLOOR_HEIGHT, 645, 645, fill="gray")
+        balls = state.balls
+        for num, (x, y, colour) in enumerate(zip(balls.x[:balls.count].tolist(), balls.y[:balls.count].tolist(),
+                                                 balls.colour[:balls.count].tolist())):
+            renderer.oval(("ball", num), x - BALL_DIAMETER / 2, y - BALL_DIAMETER / 2,
+                          x + BALL_DIAMETER / 2, y + BALL_DIAMETER / 2, fill=COLOURS[colour], below="tank")
+        for num in range(balls.count, self.drawn_balls):
+            renderer.delete(("ball", num))
+        self.drawn_balls = balls.count
+        self.draw_tank("p1", state.p1)
+        self.draw_tank("p2", p2 or state.p2)
+        renderer.rectangle(("p1", "health_bar"), 10, 10, MAX_HEALTH + 10, 20)
+        renderer.rectangle(("p1", "health"), 10, 10, state.p1.health + 10, 20, fill="red")
+        renderer.rectangle(("p2", "health_bar"), 630 - MAX_HEALTH, 10, 630, 20)
+        renderer.rectangle(("p2", "health"), 530, 10, 530 + state.p2.health, 20, fill="green")
+
+    def draw_tank(self, key: str, tank: Tank) -> None:
+        """
+        Draw a Tank
+        :param key: the key of the Tank's items
+        :param tank: the Tank to draw
+        :return: None
+        """
+        renderer = self.renderer
+        for wheel, side in enumerate((-1, 1)):
+            wheel_x = tank.x + side * WHEEL_SPACE / 2
+            renderer.oval((key, "wheel", wheel), wheel_x - WHEEL_DIAMETER / 2, tank.y + PLATFORM_HEIGHT / 2,
+                          wheel_x + WHEEL_DIAMETER / 2, tank.y + PLATFORM_HEIGHT / 2 + WHEEL_DIAMETER,
+                          fill=tank.colour, tags="tank")
+            for i in range(WHEEL_NAILS):
+                x, y = rotate_point(NAIL_SPACE / 2, 0,
+                                    math.radians(tank.x / (WHEEL_DIAMETER * math.pi) * 360 + 360 / WHEEL_NAILS * i))
+                renderer.oval((key, "nail", wheel, i), wheel_x + x - NAIL_DIAMETER / 2,
+                              tank.y + PLATFORM_HEIGHT / 2 + WHEEL_DIAMETER / 2 + y - NAIL_DIAMETER / 2,
+                              wheel_x + x + NAIL_DIAMETER / 2,
+                              tank.y + PLATFORM_HEIGHT / 2 + WHEEL_DIAMETER / 2 + y + NAIL_DIAMETER / 2,
+                              fill=tank.colour, tags="tank")
+        pnt = rotate_point(tank.facing * ((WHEEL_SPACE + WHEEL_DIAMETER + 10) / 2 - tank.recoil), 0,
+                           math.radians(-tank.facing * tank.r))
+        renderer.polygon((key, "cannon"),
+                         get_rect_rot(tank.x - tank.facing * (WHEEL_SPACE / 2 + WHEEL_DIAMETER / 2) + pnt[0],
+                                      tank.y + pnt[1],
+                                      WHEEL_SPACE + WHEEL_DIAMETER + 5,
+                                      PLATFORM_HEIGHT, tank.r if tank.facing == 1 else 180 - tank.r),
+                         fill=tank.colour, outline="black", tags="tank")
+        renderer.rectangle((key, "platform"),
+                           tank.x - WHEEL_SPACE / 2 - WHEEL_DIAMETER / 2 - 5, tank.y - PLATFORM_HEIGHT / 2,
+                           tank.x + WHEEL_SPACE / 2 + WHEEL_DIAMETER / 2 + 5, tank.y + PLATFORM_HEIGHT / 2,
+                           fill=tank.colour, tags="tank")